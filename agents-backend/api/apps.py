@@ -1,5 +1,56 @@
+import threading
+
 from django.apps import AppConfig
+from django.core.signals import request_started
+
+WARMUP_DISPATCH_UID = 'api-llm-warmup'
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from django.conf import settings
+
+        # 启动阶段不访问数据库（migrate 等管理命令执行时模型表可能还不存在），
+        # 收到第一个请求后再在后台线程中预热；部署脚本也可以执行 python manage.py warm_up_llm
+        if settings.LLM_WARMUP:
+            request_started.connect(
+                self._warm_up_on_first_request, dispatch_uid=WARMUP_DISPATCH_UID
+            )
+
+    def _warm_up_on_first_request(self, **kwargs):
+        # 断开成功的那个请求负责预热，并发的第一批请求只会触发一次
+        if not request_started.disconnect(dispatch_uid=WARMUP_DISPATCH_UID):
+            return
+        threading.Thread(
+            target=self.warm_up_models, name='llm-warmup', daemon=True
+        ).start()
+
+    def warm_up_models(self):
+        """为已启用的模型预热连接"""
+        import os
+        from django.conf import settings
+        from django.db import DatabaseError, connection
+        from .llm import warm_up
+        from .models import ModelConfig
+
+        try:
+            configs = list(ModelConfig.objects.filter(is_active=True))
+        except DatabaseError:
+            return
+        finally:
+            # 在后台线程中执行时关闭该线程的数据库连接
+            connection.close()
+        seen = set()
+        for config in configs:
+            base_url = config.api_base_url or settings.LLM_BASE_URL
+            if base_url in seen:
+                continue
+            seen.add(base_url)
+            api_key = (
+                config.api_key
+                or os.getenv(config.api_key_env or "SILICONFLOW_API_KEY")
+                or os.getenv("SILICONFLOW_API_KEY")
+            )
+            warm_up(base_url, api_key)
@@ -0,0 +1,61 @@
+import threading
+import httpx
+from django.conf import settings
+from langchain_openai import ChatOpenAI
+
+_lock = threading.Lock()
+# (model, base_url, api_key, temperature) -> ChatOpenAI
+_models = {}
+# base_url -> httpx.Client，同一服务商的模型共用连接池
+_http_clients = {}
+
+
+def _get_http_client(base_url):
+    client = _http_clients.get(base_url)
+    if client is None:
+        client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_POOL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=settings.LLM_REQUEST_TIMEOUT,
+        )
+        _http_clients[base_url] = client
+    return client
+
+
+def get_chat_model(model, base_url, api_key, temperature=0.7):
+    """
+    获取长期复用的 ChatOpenAI 实例，避免每个请求重新建立 HTTP/TLS 连接
+    """
+    key = (model, base_url, api_key, temperature)
+    llm = _models.get(key)
+    if llm is not None:
+        return llm
+    with _lock:
+        llm = _models.get(key)
+        if llm is None:
+            llm = ChatOpenAI(
+                model=model,
+                base_url=base_url,
+                api_key=api_key,
+                temperature=temperature,
+                streaming=True,
+                http_client=_get_http_client(base_url),
+            )
+            _models[key] = llm
+    return llm
+
+
+def warm_up(base_url, api_key):
+    """预先建立到服务商的 TLS 连接"""
+    with _lock:
+        client = _get_http_client(base_url)
+    try:
+        client.get(
+            base_url.rstrip("/") + "/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+    except httpx.HTTPError:
+        pass
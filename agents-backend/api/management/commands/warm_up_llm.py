@@ -0,0 +1,9 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = '为已启用的模型预热到服务商的连接'
+
+    def handle(self, *args, **options):
+        apps.get_app_config('api').warm_up_models()
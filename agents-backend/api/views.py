@@ -13,12 +13,13 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
+from django.conf import settings
 from django.http import StreamingHttpResponse
 import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from .llm import get_chat_model
 from langchain_core.prompts import ChatPromptTemplate
 
 # Explicitly load .env file
@@ -90,7 +91,7 @@ class ChatView(APIView):
         # 获取模型配置
         try:
             model_config = ModelConfig.objects.get(model_id=model_id, is_active=True)
-            api_base_url = model_config.api_base_url or "https://api.siliconflow.cn/v1"
+            api_base_url = model_config.api_base_url or settings.LLM_BASE_URL
             # 优先使用直接配置的 API Key，其次从环境变量读取
             api_key = (
                 model_config.api_key
@@ -99,7 +100,7 @@ class ChatView(APIView):
             )
         except ModelConfig.DoesNotExist:
             # 使用默认配置
-            api_base_url = "https://api.siliconflow.cn/v1"
+            api_base_url = settings.LLM_BASE_URL
             api_key = os.getenv("SILICONFLOW_API_KEY")
 
         # 检查 API Key 是否存在
@@ -113,13 +114,7 @@ class ChatView(APIView):
 
         def event_stream():
             try:
-                llm = ChatOpenAI(
-                    model=model_id,
-                    base_url=api_base_url,
-                    api_key=api_key,
-                    temperature=0.7,
-                    streaming=True,
-                )
+                llm = get_chat_model(model_id, api_base_url, api_key, temperature=0.7)
 
                 # 转换消息格式
                 langchain_messages = []
@@ -142,3 +142,16 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# LLM client pool
+# 同一 (model, base_url, api_key, temperature) 复用同一个客户端和连接池
+
+LLM_POOL_MAX_CONNECTIONS = int(os.environ.get('LLM_POOL_MAX_CONNECTIONS', '100'))
+LLM_POOL_MAX_KEEPALIVE = int(os.environ.get('LLM_POOL_MAX_KEEPALIVE', '20'))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.environ.get('LLM_POOL_KEEPALIVE_EXPIRY', '60'))
+LLM_REQUEST_TIMEOUT = float(os.environ.get('LLM_REQUEST_TIMEOUT', '120'))
+# 与 agents-langgraph 相同的取值：1 / true / yes / on（不区分大小写）开启
+LLM_WARMUP = os.environ.get('LLM_WARMUP', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+# 未配置 api_base_url 的模型使用的默认地址，可指向本地模拟服务进行压测
+LLM_BASE_URL = os.environ.get('LLM_BASE_URL', 'https://api.siliconflow.cn/v1')
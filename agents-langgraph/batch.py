@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from main import app as workflow
+from usage import track_request
+from nodes import normalize_content
+from prescreen import public_scores
+from tracing import traced
+
+# 批量检测并发数，可通过请求参数 concurrency 覆盖，但不超过上限
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+
+# 返回给调用方的状态键
+RESULT_KEYS = (
+    "is_sensitive",
+    "confidence",
+    "evidence",
+    "lexicon_version",
+    "cache_hit",
+    "prescreen_score",
+)
+
+
+def resolve_concurrency(value):
+    try:
+        concurrency = int(value) if value is not None else BATCH_CONCURRENCY
+    except (TypeError, ValueError):
+        concurrency = BATCH_CONCURRENCY
+    return max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+
+
+def parse_item(item):
+    """校验单个文档；NDJSON 输入时 item 为尚未解析的行"""
+    if isinstance(item, (str, bytes)):
+        item = json.loads(item)
+    if not isinstance(item, dict) or not isinstance(item.get("doc_content"), str):
+        raise ValueError("每个文档必须是包含 doc_content 字符串的对象")
+    return {"doc_title": item.get("doc_title", ""), "doc_content": item["doc_content"]}
+
+
+def format_result(index, item, state, request_usage):
+    result = {key: state[key] for key in RESULT_KEYS if key in state}
+    return {
+        "index": index,
+        "doc_title": item["doc_title"],
+        "result": result,
+        "usage": request_usage.summary()["total"],
+    }
+
+
+def format_error(index, e):
+    return {"index": index, "error": f"{type(e).__name__}: {str(e)}"}
+
+
+def prescore(items):
+    """
+    JSON 数组输入时用 NumPy 一次性批量计算预筛分数，与 items 一一对应；
+    流式输入或未启用预筛时返回 None，由预筛节点逐篇计算
+    """
+    if not isinstance(items, list):
+        return None
+    positions = []
+    texts = []
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and isinstance(item.get("doc_content"), str):
+            positions.append(i)
+            texts.append(normalize_content(item["doc_content"]))
+    scores = public_scores(texts)
+    if scores is None:
+        return None
+    result = [None] * len(items)
+    for i, score in zip(positions, scores):
+        result[i] = float(score)
+    return result
+
+
+def initial_input(item, prescreen_score):
+    if prescreen_score is None:
+        return item
+    return {**item, "prescreen_score": prescreen_score}
+
+
+def classify_item(index, item, prescreen_score=None):
+    # 单个文档的错误只影响该文档自身的结果行
+    try:
+        item = parse_item(item)
+        with track_request() as request_usage, traced("batch_item", index=index):
+            state = workflow.invoke(initial_input(item, prescreen_score))
+        return format_result(index, item, state, request_usage)
+    except Exception as e:
+        return format_error(index, e)
+
+
+async def aclassify_item(index, item, prescreen_score=None):
+    try:
+        item = parse_item(item)
+        with track_request() as request_usage, traced("batch_item", index=index):
+            state = await workflow.ainvoke(initial_input(item, prescreen_score))
+        return format_result(index, item, state, request_usage)
+    except Exception as e:
+        return format_error(index, e)
+
+
+def iter_ndjson(lines):
+    for line in lines:
+        if line.strip():
+            yield line
+
+
+async def aiter_ndjson(chunks):
+    """把异步字节流切分为 NDJSON 行"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def run_batch(items, concurrency=None):
+    """
+    以有限并发检测一批文档，按完成顺序逐个产出结果；
+    items 可以是惰性迭代器，在途文档数不超过并发数，输入不会被一次性读入内存
+    """
+    concurrency = resolve_concurrency(concurrency)
+    scores = prescore(items)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = set()
+    try:
+        for index, item in enumerate(items):
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            score = scores[index] if scores else None
+            pending.add(executor.submit(classify_item, index, item, score))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # 客户端断开时不再等待尚未开始的文档
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def arun_batch(items, concurrency=None):
+    """run_batch 的异步版本，items 为同步或异步可迭代对象"""
+    concurrency = resolve_concurrency(concurrency)
+    scores = prescore(items)
+    if not hasattr(items, "__aiter__"):
+        items = _aiter(items)
+    pending = set()
+    index = 0
+    try:
+        async for item in items:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+            score = scores[index] if scores else None
+            pending.add(asyncio.ensure_future(aclassify_item(index, item, score)))
+            index += 1
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    finally:
+        # 客户端断开时取消仍在执行的文档
+        for task in pending:
+            task.cancel()
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
@@ -0,0 +1,235 @@
+"""
+离线准确率与延迟基准测试：用 db/test.db 中的标注数据回放 main.py 编译后的工作流
+
+python benchmark.py --concurrency 4 --output benchmark_report.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(current_dir, "..", "db", "test.db")
+
+# 工作流中需要统计耗时的节点
+NODE_NAMES = (
+    "start_node",
+    "verdict_cache",
+    "hard_condition_node",
+    "agent_semantics",
+    "agent_non_secret_proof",
+    "agent_decision",
+    "prescreen_node",
+    "cache_store",
+)
+
+
+def percentile(values, q):
+    """最近秩法百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def latency_summary(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+def make_callback():
+    # 延迟导入，保证命令行参数中的缓存开关先写入环境变量
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class BenchmarkCallback(BaseCallbackHandler):
+        """收集节点耗时；LLM 调用次数与 token 用量由 usage.track_request 统计"""
+
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.starts = {}
+            self.node_latency = {name: [] for name in NODE_NAMES}
+
+        def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+            name = kwargs.get("name") or (serialized or {}).get("name")
+            if name in self.node_latency:
+                with self.lock:
+                    self.starts[run_id] = (name, time.perf_counter())
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            with self.lock:
+                started = self.starts.pop(run_id, None)
+                if started is not None:
+                    name, start = started
+                    self.node_latency[name].append(time.perf_counter() - start)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            with self.lock:
+                self.starts.pop(run_id, None)
+
+    return BenchmarkCallback()
+
+
+def load_samples(db_path, limit=None):
+    conn = sqlite3.connect(db_path)
+    query = "SELECT id, title, summary, is_sensitive FROM test ORDER BY id"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    rows = conn.execute(query).fetchall()
+    conn.close()
+    return [
+        {"id": row[0], "title": row[1], "summary": row[2], "label": bool(row[3])}
+        for row in rows
+    ]
+
+
+def classification_metrics(records):
+    tp = sum(1 for r in records if r["predicted"] and r["label"])
+    fp = sum(1 for r in records if r["predicted"] and not r["label"])
+    fn = sum(1 for r in records if not r["predicted"] and r["label"])
+    tn = sum(1 for r in records if not r["predicted"] and not r["label"])
+    total = tp + fp + fn + tn
+    return {
+        "tp": tp,
+        "fp": fp,
+        "fn": fn,
+        "tn": tn,
+        "accuracy": (tp + tn) / total if total else None,
+        "precision": tp / (tp + fp) if tp + fp else None,
+        "recall": tp / (tp + fn) if tp + fn else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=current_dir, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(samples, concurrency):
+    from main import app as workflow
+    from prompts import PROMPT_VERSION
+    from common_model import LLM_HEDGE, hedge_stats
+    from usage import empty_totals, track_request
+
+    callback = make_callback()
+
+    def run_one(sample):
+        start = time.perf_counter()
+        # 与线上一致按 usage_metadata 读取用量（流式调用没有 llm_output.token_usage）
+        with track_request() as request_usage:
+            try:
+                state = workflow.invoke(
+                    {"doc_title": sample["title"], "doc_content": sample["summary"]},
+                    config={"callbacks": [callback]},
+                )
+                error = None
+            except Exception as e:
+                state = {}
+                error = f"{type(e).__name__}: {str(e)}"
+        return {
+            "id": sample["id"],
+            "label": sample["label"],
+            "predicted": bool(state.get("is_sensitive")),
+            "confidence": state.get("confidence"),
+            "latency": time.perf_counter() - start,
+            "prescreen_skipped": state.get("current_node") == "prescreen_node",
+            "usage": request_usage.summary()["total"],
+            "error": error,
+        }
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        records = list(executor.map(run_one, samples))
+    wall_time = time.perf_counter() - wall_start
+
+    completed = [r for r in records if r["error"] is None]
+    usage = empty_totals()
+    for record in records:
+        for key in usage:
+            usage[key] += record["usage"][key]
+    return {
+        "commit": git_commit(),
+        "model": os.getenv("MODEL"),
+        "prompt_version": PROMPT_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "concurrency": concurrency,
+        "documents": len(records),
+        "errors": len(records) - len(completed),
+        "wall_time": wall_time,
+        "throughput": len(records) / wall_time if wall_time else None,
+        "end_to_end_latency": latency_summary([r["latency"] for r in completed]),
+        "node_latency": {
+            name: latency_summary(values)
+            for name, values in callback.node_latency.items()
+            if values
+        },
+        "llm": {
+            "calls": usage["calls"],
+            "calls_per_document": usage["calls"] / len(records) if records else None,
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
+            "cached_tokens": usage["cached_tokens"],
+        },
+        "prescreen": {
+            "skipped": sum(1 for r in records if r["prescreen_skipped"]),
+            "skip_rate": (
+                sum(1 for r in records if r["prescreen_skipped"]) / len(records)
+                if records
+                else None
+            ),
+        },
+        "hedge": hedge_stats() if LLM_HEDGE else None,
+        "classification": classification_metrics(completed),
+        "records": records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="涉密检测工作流基准测试")
+    parser.add_argument("--db", default=DEFAULT_DB, help="标注数据库路径")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发文档数")
+    parser.add_argument("--limit", type=int, default=None, help="最多测试的文档数")
+    parser.add_argument(
+        "--output", default="benchmark_report.json", help="报告输出路径（JSON）"
+    )
+    parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="保留判定结果与 LLM 响应缓存（默认关闭，测量真实调用）",
+    )
+    args = parser.parse_args()
+
+    if not args.use_cache:
+        os.environ["VERDICT_CACHE"] = "0"
+        os.environ["RESPONSE_CACHE"] = "0"
+
+    samples = load_samples(args.db, args.limit)
+    report = run_benchmark(samples, args.concurrency)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    metrics = report["classification"]
+    print(
+        f"文档 {report['documents']} 篇，错误 {report['errors']}，"
+        f"吞吐 {report['throughput']:.2f} 篇/秒，"
+        f"准确率 {metrics['accuracy']}，精确率 {metrics['precision']}，召回率 {metrics['recall']}"
+    )
+    print(f"报告已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
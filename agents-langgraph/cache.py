@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from prescreen import PRESCREEN_VERSION
+from utils.normalize import NORMALIZE_VERSION
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def verdict_key(content, lexicon_version, model, prompt_version, namespace="graph"):
+    """
+    判定结果缓存键：规范化后文档内容的哈希 + 词库版本 + 模型 + 提示词版本 + 规范化配置版本
+    + 预筛模型摘要与阈值（预筛直接给出的结论随模型和阈值变化）
+    namespace 区分不同流水线（langgraph 工作流 / flask 接口）的结果格式
+    """
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return (
+        f"{namespace}:{digest}:{lexicon_version}:{model}:{prompt_version}"
+        f":{NORMALIZE_VERSION}:{PRESCREEN_VERSION}"
+    )
+
+
+def response_key(model, prompt_text):
+    """LLM 响应缓存键：完整渲染后的提示词 + 模型"""
+    digest = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class SQLiteCache:
+    """
+    基于 SQLite 的键值缓存，支持 TTL 过期与按访问时间的 LRU 淘汰
+    文件型数据库可被多个 worker 进程共享
+    """
+
+    def __init__(self, path, table, ttl=7 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+              key TEXT PRIMARY KEY,
+              value TEXT NOT NULL,
+              created_at REAL NOT NULL,
+              accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table} (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute(
+                        f"DELETE FROM {self.table} WHERE key = ?", (key,)
+                    )
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # 先清理过期条目，再按最近访问时间淘汰超出容量的部分
+        if self.ttl:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?",
+                (time.time() - self.ttl,),
+            )
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+    def export(self, path):
+        """导出为 JSONL（每行 key/value/created_at），用于离线基准测试"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value, created_at FROM {self.table} ORDER BY created_at"
+            ).fetchall()
+        with open(path, "w", encoding="utf-8") as f:
+            for key, value, created_at in rows:
+                record = {"key": key, "value": json.loads(value), "created_at": created_at}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(rows)
+
+
+cache_path = os.getenv("CACHE_PATH", os.path.join(current_dir, "cache/cache.db"))
+
+# 设置 VERDICT_CACHE=0 关闭判定结果缓存
+verdict_cache = None
+if os.getenv("VERDICT_CACHE", "1") != "0":
+    verdict_cache = SQLiteCache(
+        cache_path,
+        "verdicts",
+        ttl=float(os.getenv("VERDICT_CACHE_TTL", str(7 * 24 * 3600))),
+        max_entries=int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "10000")),
+    )
+
+# 设置 RESPONSE_CACHE=0 关闭节点级 LLM 响应缓存
+response_cache = None
+if os.getenv("RESPONSE_CACHE", "1") != "0":
+    response_cache = SQLiteCache(
+        cache_path,
+        "llm_responses",
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", str(30 * 24 * 3600))),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "50000")),
+    )
+
+
+if __name__ == "__main__":
+    # 导出缓存：python cache.py export responses.jsonl [verdicts|llm_responses]
+    import sys
+
+    if len(sys.argv) < 3 or sys.argv[1] != "export":
+        print("用法: python cache.py export <输出文件> [verdicts|llm_responses]")
+        sys.exit(1)
+    table = sys.argv[3] if len(sys.argv) > 3 else "llm_responses"
+    count = SQLiteCache(cache_path, table).export(sys.argv[2])
+    print(f"已导出 {count} 条记录")
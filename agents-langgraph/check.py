@@ -0,0 +1,328 @@
+import asyncio
+import os
+from concurrent.futures import as_completed
+from contextvars import copy_context
+from agents import (
+    adecision_events,
+    agent_keyword,
+    agent_semantics,
+    agent_semantics_async,
+    agent_non_secret_proof,
+    agent_non_secret_proof_async,
+    keyword_fast_path,
+)
+from cache import verdict_cache, verdict_key
+from ingest import extract_text
+from metrics import observe_node, timed_node
+from nodes import hard_condition_node, normalize_content, start_node
+from prompts import PROMPT_VERSION
+from usage import start_request
+from tracing import finish_trace, start_trace
+from utils.lexicon import registry
+
+
+def initial_state(doc_title, doc_content):
+    return {
+        "doc_title": doc_title,
+        "doc_content": doc_content,
+        "keywords_list": [],
+        "current_node": "start_node",
+        "agent_keyword_result": False,
+        "agent_keyword_detail": "",
+        "agent_keyword_confidence": 0,
+        "agent_semantics_result": False,
+        "agent_semantics_detail": "",
+        "agent_semantics_confidence": 0,
+        "agent_non_secret_proof_result": False,
+        "agent_non_secret_proof_detail": "",
+        "agent_non_secret_proof_confidence": 0,
+        "result": False,
+        "result_detail": "",
+        "result_confidence": 0,
+    }
+
+
+# 写入判定结果缓存的字段：只保存判定结论，不保存文档标题与正文
+CHECK_VERDICT_KEYS = (
+    "keywords_list",
+    "agent_keyword_result",
+    "agent_keyword_detail",
+    "agent_keyword_confidence",
+    "agent_semantics_result",
+    "agent_semantics_detail",
+    "agent_semantics_confidence",
+    "agent_non_secret_proof_result",
+    "agent_non_secret_proof_detail",
+    "agent_non_secret_proof_confidence",
+    "result",
+    "result_detail",
+    "result_confidence",
+    "current_node",
+)
+
+
+def cached_verdict(state):
+    """从请求状态中取出需要缓存的判定字段"""
+    return {key: state[key] for key in CHECK_VERDICT_KEYS if key in state}
+
+
+def apply_cached_verdict(input_state, cached):
+    """
+    把缓存的判定字段合并进本次请求的状态，文档标题等请求字段保持本次请求的值；
+    旧版本缓存中的多余字段（如文档正文）一并忽略
+    """
+    input_state.update(cached_verdict(cached))
+    input_state["cache_hit"] = True
+    return input_state
+
+
+def progress(node, data):
+    return {"type": "progress", "node": node, "data": data}
+
+
+def stream_token(token):
+    return {"type": "stream_token", "node": "agent_decision", "token": token}
+
+
+def verdict_event(verdict):
+    return {"type": "verdict", "node": "agent_decision", "data": verdict}
+
+
+def decision_event(kind, data):
+    """决策评审流中的 token / verdict 转为对外事件，final 返回 None"""
+    if kind == "token":
+        return stream_token(data)
+    if kind == "verdict":
+        return verdict_event(data)
+    return None
+
+
+def final_event(input_state, request_trace, trace, request_usage=None):
+    final = {"type": "final", "data": input_state}
+    if request_usage is not None:
+        final["usage"] = request_usage.summary()
+    trace_data = finish_trace(request_trace)
+    if trace:
+        final["trace"] = trace_data
+    return final
+
+
+# 以下各阶段由 flask 版本与异步版本的 /check 共用，同步阶段在异步版本中放到线程中执行
+
+
+def check_cache_key(doc_content, namespace="check"):
+    """判定结果缓存的键，未开启缓存时返回 None"""
+    if verdict_cache is None:
+        return None
+    return verdict_key(
+        normalize_content(doc_content),
+        registry.version,
+        os.getenv("MODEL"),
+        PROMPT_VERSION,
+        namespace=namespace,
+    )
+
+
+def lookup_verdict(cache_key, input_state):
+    """查询判定结果缓存，命中时把缓存的判定合并进 input_state 并返回 True"""
+    cached = verdict_cache.get(cache_key)
+    if cached is None:
+        return False
+    apply_cached_verdict(input_state, cached)
+    return True
+
+
+def store_verdict(cache_key, input_state, decision_result, parse_failed):
+    """写入判定结果缓存（解析失败或报告被截断的结果不缓存）"""
+    if (
+        cache_key is None
+        or parse_failed
+        or decision_result.get("result_detail_truncated")
+    ):
+        return
+    verdict_cache.set(cache_key, cached_verdict(input_state))
+
+
+def keyword_stage(input_state):
+    """执行关键词检测并合并结果，返回进度事件"""
+    with observe_node("agent_keyword"):
+        keyword_result = agent_keyword(input_state)
+    input_state.update(keyword_result)
+    return progress("agent_keyword", keyword_result)
+
+
+# 关键词检测未直接判定时并行执行的分析节点：(节点名, 同步实现, 异步实现)
+ANALYSIS_NODES = (
+    ("agent_semantics", agent_semantics, agent_semantics_async),
+    ("agent_non_secret_proof", agent_non_secret_proof, agent_non_secret_proof_async),
+)
+
+
+def analysis_stage(input_state, executor):
+    """在线程池中并行执行分析节点，按完成顺序合并结果并产出进度事件"""
+    futures = {
+        executor.submit(
+            copy_context().run, timed_node(node, fn), dict(input_state)
+        ): node
+        for node, fn, _ in ANALYSIS_NODES
+    }
+    for future in as_completed(futures):
+        node_result = future.result()
+        input_state.update(node_result)
+        yield progress(futures[future], node_result)
+
+
+async def aanalysis_stage(input_state):
+    """analysis_stage 的异步版本"""
+    tasks = [
+        run_node(node, afn(dict(input_state))) for node, _, afn in ANALYSIS_NODES
+    ]
+    for future in asyncio.as_completed(tasks):
+        node, node_result = await future
+        input_state.update(node_result)
+        yield progress(node, node_result)
+
+
+def finish_decision(input_state, decision_result):
+    """合并决策结果，返回 (决策评审完成的进度事件, 是否解析失败)"""
+    parse_failed = decision_result.pop("parse_failed", False)
+    input_state.update(decision_result)
+    return progress("agent_decision", decision_result), parse_failed
+
+
+def hard_condition_stage(doc_title, doc_content):
+    """
+    与工作流相同的前置阶段（同步，在线程中执行）：start_node 规范化正文，
+    hard_condition_node 在原文上做关键词、短语与短语近似匹配；返回 (规范化后的正文, 检测结果)
+    """
+    state = start_node({"doc_title": doc_title, "doc_content": doc_content})
+    state = hard_condition_node(state)
+    result = {
+        "is_sensitive": state["is_sensitive"],
+        "evidence": state["evidence"],
+        "lexicon_version": state["lexicon_version"],
+    }
+    return state["doc_content"], result
+
+
+def hard_condition_decision(result):
+    """硬条件命中时直接给出的决策结果，不再调用 LLM"""
+    return {
+        "result": True,
+        "result_detail": result["evidence"],
+        "result_confidence": 100,
+        "current_node": "hard_condition_node",
+    }
+
+
+async def run_node(node, coro):
+    with observe_node(node):
+        return node, await coro
+
+
+async def check_events(
+    doc_title, doc_content, trace=False, verdict_only=False, hard_condition=False
+):
+    """
+    /check 的异步实现，逐个产出与 flask 版本相同的事件（progress / stream_token / final），
+    等待模型期间不占用线程，单进程可同时保持大量流式连接
+    trace: 为 True 时在最终事件中附带本次请求的 span 树
+    verdict_only: 为 True 时裁决字段解析完成后立即取消决策评审的生成
+    hard_condition: 为 True 时以工作流的 start_node 规范化与 hard_condition_node 检测代替关键词检测，
+    命中即判定为涉密并结束，未命中时后续分析使用规范化后的正文（上传文档使用）
+    """
+    request_usage = start_request()
+    request_trace = start_trace("check", attach=trace, doc_title=doc_title)
+    input_state = initial_state(doc_title, doc_content)
+
+    # 发送开始消息
+    yield progress("start_node", {})
+
+    # 查询判定结果缓存，命中则直接返回缓存的最终结果；两种前置检测的结果不同，分开缓存
+    cache_key = check_cache_key(
+        doc_content, "check_upload" if hard_condition else "check"
+    )
+    if cache_key is not None:
+        hit = await asyncio.to_thread(lookup_verdict, cache_key, input_state)
+        yield progress("verdict_cache", {"hit": hit})
+        if hit:
+            yield final_event(input_state, request_trace, trace)
+            return
+
+    decision_result = None
+    parse_failed = False
+    if hard_condition:
+        # 规范化与词库扫描耗时随文档长度增长，放到线程中执行，不阻塞其他连接
+        with observe_node("hard_condition_node"):
+            content, result = await asyncio.to_thread(
+                hard_condition_stage, doc_title, doc_content
+            )
+        # 后续分析与决策使用规范化后的正文
+        input_state["doc_content"] = content
+        yield progress("hard_condition_node", result)
+        if result["is_sensitive"]:
+            decision_result = hard_condition_decision(result)
+    else:
+        # 执行关键词检测：规范化与词库扫描耗时随文档长度增长，放到线程中执行，不阻塞其他连接
+        yield await asyncio.to_thread(keyword_stage, input_state)
+
+    if decision_result is None:
+        # 关键词检测未直接判定时，并行执行语义检测和非涉密证明
+        if not keyword_fast_path(input_state):
+            async for event in aanalysis_stage(input_state):
+                yield event
+
+        # 发送决策评审开始消息
+        yield progress("agent_decision", {"status": "started"})
+
+        # 裁决字段解析完成后立即发送，不等待 result_detail 生成完毕
+        decision_result = {}
+        events = adecision_events(input_state, verdict_only)
+        with observe_node("agent_decision"):
+            try:
+                async for kind, data in events:
+                    event = decision_event(kind, data)
+                    if event is None:
+                        decision_result = data
+                    else:
+                        yield event
+            finally:
+                # 客户端断开时立即关闭上游 HTTP 流，不等待异步生成器被回收
+                await events.aclose()
+
+        # 发送决策评审完成消息
+        event, parse_failed = finish_decision(input_state, decision_result)
+        yield event
+    else:
+        input_state.update(decision_result)
+
+    if cache_key is not None:
+        await asyncio.to_thread(
+            store_verdict, cache_key, input_state, decision_result, parse_failed
+        )
+
+    # 发送最终结果
+    yield final_event(input_state, request_trace, trace, request_usage)
+
+
+async def upload_events(
+    file, filename="", content_type="", doc_title="", trace=False, verdict_only=False
+):
+    """
+    上传文档的 /check：先抽取文本（单独作为 extract 阶段上报耗时），
+    再把抽取结果交给 check_events，经 start_node 规范化与硬条件检测后进行后续分析
+    """
+    with observe_node("extract"):
+        text, stats = await asyncio.to_thread(extract_text, file, filename, content_type)
+    yield progress("extract", stats)
+
+    async for event in check_events(
+        doc_title or filename,
+        text,
+        trace=trace,
+        verdict_only=verdict_only,
+        hard_condition=True,
+    ):
+        if event["type"] == "final":
+            event["extract"] = stats
+        yield event
@@ -0,0 +1,354 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextvars import copy_context
+import httpx
+import openai
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from cache import response_cache, response_key
+from usage import usage_callback
+from tracing import span, trace_event
+from metrics import record_hedge
+from utils.parse_json import parse_json, require_keys
+
+load_dotenv()
+
+# 模型服务地址，可指向本地模拟服务（见 stub_llm.py）进行压测
+DEFAULT_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.siliconflow.cn/v1")
+
+# 连接池配置，可通过环境变量调整
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "60"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+
+# 对冲请求：设置 LLM_HEDGE=1 开启，调用超过按近期耗时百分位计算的等待时间仍未返回时再发一次
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# 近期样本不足 HEDGE_MIN_SAMPLES 个时使用的固定等待时间（秒）
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "5"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "500"))
+# 对冲请求发往的备用端点，未设置的项使用与原请求相同的模型、端点和密钥
+HEDGE_MODEL = os.getenv("HEDGE_MODEL")
+HEDGE_BASE_URL = os.getenv("HEDGE_BASE_URL")
+HEDGE_API_KEY = os.getenv("HEDGE_API_KEY")
+# 执行原请求的线程数，对冲请求使用单独的线程池，原请求占满时不会挤占对冲
+HEDGE_POOL_SIZE = int(os.getenv("HEDGE_POOL_SIZE", "64"))
+# 同时在途的对冲请求上限（即对冲线程池大小），上游整体变慢时对冲不会把请求量翻倍
+HEDGE_MAX_INFLIGHT = int(os.getenv("HEDGE_MAX_INFLIGHT", str(max(1, HEDGE_POOL_SIZE // 4))))
+
+_lock = threading.Lock()
+# (model, base_url, api_key, temperature) -> ChatOpenAI
+_models = {}
+# base_url -> (httpx.Client, httpx.AsyncClient)，同一服务商的模型共用连接池
+_http_clients = {}
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _get_http_clients(base_url):
+    clients = _http_clients.get(base_url)
+    if clients is None:
+        clients = (
+            httpx.Client(limits=_limits(), timeout=REQUEST_TIMEOUT),
+            httpx.AsyncClient(limits=_limits(), timeout=REQUEST_TIMEOUT),
+        )
+        _http_clients[base_url] = clients
+    return clients
+
+
+def get_model(model=None, base_url=None, api_key=None, temperature=0):
+    """
+    获取长期复用的 ChatOpenAI 实例，相同配置返回同一个对象，
+    底层 HTTP/TLS 连接在各节点、各请求之间共享
+    """
+    model = model or os.getenv("MODEL")
+    base_url = base_url or DEFAULT_BASE_URL
+    api_key = api_key or os.getenv("SILICONFLOW_API_KEY")
+    key = (model, base_url, api_key, temperature)
+    llm = _models.get(key)
+    if llm is not None:
+        return llm
+    with _lock:
+        llm = _models.get(key)
+        if llm is None:
+            http_client, http_async_client = _get_http_clients(base_url)
+            llm = ChatOpenAI(
+                model=model,
+                base_url=base_url,
+                api_key=api_key,
+                temperature=temperature,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                # 流式调用同样返回 token 用量，由 usage_callback 统一记录
+                stream_usage=True,
+                callbacks=[usage_callback],
+            )
+            _models[key] = llm
+    return llm
+
+
+def invoke_json(prompt, state, llm=None, required=()):
+    """
+    渲染提示词并调用模型，返回解析后的 JSON；
+    以完整渲染后的提示词 + 模型为键缓存解析结果。解析失败时抛出 JSONDecodeError，
+    缺少 required 中的字段时抛出 KeyError，两种情况都不写入缓存
+    """
+    llm = llm or get_model()
+    prompt_value = prompt.invoke(state)
+    key = response_key(llm.model_name, prompt_value.to_string())
+    if response_cache is not None:
+        cached = response_cache.get(key)
+        # 缓存中不完整的旧结果视为未命中
+        if isinstance(cached, dict) and all(k in cached for k in required):
+            trace_event("response_cache_hit")
+            return cached
+    if LLM_HEDGE:
+        response_json = hedged_invoke_json(prompt_value, llm, required)
+    else:
+        response = llm.invoke(prompt_value)
+        with span("parse", kind="parse"):
+            response_json = parse_json(response.content)
+    require_keys(response_json, required)
+    if response_cache is not None:
+        response_cache.set(key, response_json)
+    return response_json
+
+
+class LatencyWindow:
+    """最近 HEDGE_WINDOW 次调用的耗时，对冲等待时间取其 HEDGE_PERCENTILE 百分位"""
+
+    def __init__(self, size=HEDGE_WINDOW):
+        self.values = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, value):
+        with self.lock:
+            self.values.append(value)
+
+    def delay(self):
+        with self.lock:
+            values = sorted(self.values)
+        if len(values) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DELAY
+        rank = min(len(values) - 1, int(len(values) * HEDGE_PERCENTILE / 100))
+        return values[rank]
+
+
+# 模型名 -> LatencyWindow
+_latency = {}
+_primary_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix="primary")
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_MAX_INFLIGHT, thread_name_prefix="hedge")
+_hedge_slots = threading.BoundedSemaphore(HEDGE_MAX_INFLIGHT)
+# 进程内的对冲统计：not_hedged / primary_won / hedge_won / failed /
+# limited（对冲达到在途上限，或原请求线程池占满，未发出对冲）
+_hedge_counts = Counter()
+
+
+def latency_window(model_name):
+    with _lock:
+        return _latency.setdefault(model_name, LatencyWindow())
+
+
+def hedge_stats():
+    """对冲率 = 发出对冲请求的调用 / 全部调用；胜出率 = 对冲请求先返回 / 发出对冲的调用"""
+    with _lock:
+        counts = dict(_hedge_counts)
+    calls = sum(counts.values())
+    hedged = sum(counts.get(key, 0) for key in ("primary_won", "hedge_won", "failed"))
+    return {
+        **counts,
+        "calls": calls,
+        "hedge_rate": hedged / calls if calls else None,
+        "win_rate": counts.get("hedge_won", 0) / hedged if hedged else None,
+    }
+
+
+def _record_hedge(outcome):
+    with _lock:
+        _hedge_counts[outcome] += 1
+    record_hedge(outcome)
+
+
+def _complete_json(llm, prompt_value, cancelled, required=(), started=None):
+    """
+    流式调用并解析为 JSON，返回 (结果, 耗时)；cancelled 置位后在下一个 token 到达时关闭流，
+    上游停止生成。started 在真正发出请求时置位（不含在线程池中排队的时间）。
+    输出无法解析或缺少 required 中的字段时抛出异常，视为无效响应
+    """
+    if started is not None:
+        started.set()
+    start = time.perf_counter()
+    response = llm.stream(prompt_value)
+    content = ""
+    try:
+        for chunk in response:
+            if cancelled.is_set():
+                return None
+            content += chunk.content
+    finally:
+        # 关闭生成器即关闭上游 HTTP 流
+        response.close()
+    with span("parse", kind="parse"):
+        response_json = require_keys(parse_json(content), required)
+    return response_json, time.perf_counter() - start
+
+
+def _retryable(error):
+    """只有超时、429 和 5xx 值得再发一次；400、鉴权失败等错误换一个请求同样会失败"""
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _hedge_model(llm):
+    """对冲请求使用的模型：未单独配置的项沿用原请求的模型、端点和密钥"""
+    api_key = HEDGE_API_KEY
+    if api_key is None and llm.openai_api_key is not None:
+        api_key = llm.openai_api_key.get_secret_value()
+    return get_model(
+        HEDGE_MODEL or llm.model_name,
+        HEDGE_BASE_URL or llm.openai_api_base,
+        api_key,
+        llm.temperature,
+    )
+
+
+def _submit_hedge(llm, prompt_value, required):
+    """发出对冲请求，返回 (future, 取消事件)；在途对冲已达上限时返回 (None, None)"""
+    slots = _hedge_slots
+    if not slots.acquire(blocking=False):
+        return None, None
+    cancelled = threading.Event()
+    try:
+        future = _hedge_pool.submit(
+            copy_context().run,
+            _complete_json,
+            _hedge_model(llm),
+            prompt_value,
+            cancelled,
+            required,
+        )
+    except Exception:
+        slots.release()
+        raise
+    # 对冲请求结束（含被取消后关闭流）时归还名额
+    future.add_done_callback(lambda _: slots.release())
+    return future, cancelled
+
+
+def hedged_invoke_json(prompt_value, llm, required=()):
+    """
+    对冲调用：原请求发出后超过等待时间仍未返回，或因超时、429、5xx 提前失败时，
+    向备用（或同一）端点再发一次，取先返回的有效结果并取消另一个；
+    都失败时抛出最后一个异常。其他错误（含输出无效）直接抛出，不发对冲。
+    在途对冲达到 HEDGE_MAX_INFLIGHT 时只等待原请求
+    """
+    window = latency_window(llm.model_name)
+    delay = window.delay()
+    primary_cancelled = threading.Event()
+    primary_started = threading.Event()
+    primary = _primary_pool.submit(
+        copy_context().run,
+        _complete_json,
+        llm,
+        prompt_value,
+        primary_cancelled,
+        required,
+        primary_started,
+    )
+    error = None
+    # 等待时间从请求真正发出时算起，线程池排队的时间不计入；
+    # 排队超过等待时间说明原请求线程池已占满，撤回后在调用方线程直接请求，不再对冲
+    if not primary_started.wait(timeout=delay) and primary.cancel():
+        _record_hedge("limited")
+        response_json, elapsed = _complete_json(
+            llm, prompt_value, primary_cancelled, required
+        )
+        window.add(elapsed)
+        return response_json
+    try:
+        response_json, elapsed = primary.result(timeout=delay)
+        window.add(elapsed)
+        _record_hedge("not_hedged")
+        return response_json
+    except FutureTimeout:
+        trace_event("llm_hedge", delay=round(delay, 3))
+    except Exception as e:
+        if not _retryable(e):
+            _record_hedge("not_hedged")
+            raise
+        # 原请求提前失败，不再等待，直接改由对冲请求完成
+        error = e
+        trace_event("llm_hedge", reason=type(e).__name__)
+
+    hedge, hedge_cancelled = _submit_hedge(llm, prompt_value, required)
+    if hedge is None:
+        _record_hedge("limited")
+        if error is not None:
+            raise error
+        response_json, elapsed = primary.result()
+        window.add(elapsed)
+        return response_json
+
+    attempts = {hedge: ("hedge", hedge_cancelled)}
+    if error is None:
+        attempts[primary] = ("primary", primary_cancelled)
+    pending = set(attempts)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response_json, elapsed = future.result()
+            except Exception as e:
+                error = e
+                continue
+            winner = attempts[future][0]
+            # 取消仍在进行的另一个请求
+            for other in pending:
+                attempts[other][1].set()
+            if winner == "primary":
+                window.add(elapsed)
+            elif primary in attempts:
+                # 原请求至少耗时 delay + 对冲请求耗时，按此下限计入延迟样本
+                window.add(delay + elapsed)
+            trace_event("llm_hedge_result", winner=winner)
+            _record_hedge(f"{winner}_won")
+            return response_json
+    _record_hedge("failed")
+    raise error
+
+
+def warm_up(base_url=None, api_key=None):
+    """
+    预先建立到服务商的 TLS 连接，避免第一个请求承担握手延迟
+    """
+    base_url = base_url or DEFAULT_BASE_URL
+    api_key = api_key or os.getenv("SILICONFLOW_API_KEY")
+    with _lock:
+        http_client, _ = _get_http_clients(base_url)
+    try:
+        http_client.get(
+            base_url.rstrip("/") + "/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+    except httpx.HTTPError as e:
+        # 预热失败不影响服务，第一个请求照常建立连接
+        trace_event("llm_warmup_failed", error=str(e))
+
+
+# 设置 LLM_WARMUP=1（或 true / yes / on，与 agents-backend 相同）时在导入阶段预热连接
+if os.getenv("LLM_WARMUP", "0").strip().lower() in ("1", "true", "yes", "on"):
+    warm_up()
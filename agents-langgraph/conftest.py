@@ -0,0 +1 @@
+# 让 pytest 以 agents-langgraph 目录为导入根，测试中可直接 import 各模块
@@ -0,0 +1,309 @@
+"""
+上传文档的文本抽取：支持 PDF / DOCX / 纯文本
+
+上传内容先写入 SpooledTemporaryFile（超过 INGEST_SPOOL_BYTES 后落盘），
+抽取时按页 / 按段落 / 按块读取，抽取结果超过 INGEST_MAX_CHARS 即停止，内存占用有上限。
+"""
+
+import codecs
+import os
+import tempfile
+import time
+import zipfile
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    # 未安装 pypdf 时不支持 PDF 上传
+    PdfReader = None
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    try:
+        # python-multipart 0.0.13 之前的包名
+        from multipart.multipart import MultipartParser, parse_options_header
+    except ImportError:
+        # 未安装 python-multipart 时不支持表单上传
+        MultipartParser = None
+
+# 上传文件大小上限，超过时拒绝
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(50 * 1024 * 1024)))
+# 上传内容在内存中缓存的上限，超过后写入临时文件
+INGEST_SPOOL_BYTES = int(os.getenv("INGEST_SPOOL_BYTES", str(1024 * 1024)))
+# 抽取文本的字符数上限，超出部分不再抽取
+INGEST_MAX_CHARS = int(os.getenv("INGEST_MAX_CHARS", "200000"))
+# multipart 表单中除文件外的其余部分（边界、各段头部、doc_title 等短字段）的字节数上限
+INGEST_FORM_OVERHEAD = int(os.getenv("INGEST_FORM_OVERHEAD", str(64 * 1024)))
+CHUNK_BYTES = 64 * 1024
+
+# DOCX 正文的 XML 命名空间
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+}
+EXTENSIONS = {".pdf": "pdf", ".docx": "docx", ".txt": "text", ".md": "text"}
+
+
+class IngestError(ValueError):
+    """上传内容无法抽取文本；status 为对应的 HTTP 状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class TextBuffer:
+    """累积抽取出的文本片段，达到字符上限后截断"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.parts = []
+        self.chars = 0
+        self.truncated = False
+
+    def add(self, text):
+        """加入一段文本；达到上限时返回 False，调用方应停止抽取"""
+        if self.truncated:
+            return False
+        remaining = self.max_chars - self.chars
+        if len(text) > remaining:
+            text = text[:remaining]
+            self.truncated = True
+        self.parts.append(text)
+        self.chars += len(text)
+        return not self.truncated
+
+    def text(self):
+        return "".join(self.parts)
+
+
+def detect_format(filename="", content_type=""):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in CONTENT_TYPES:
+        return CONTENT_TYPES[content_type]
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    if content_type.startswith("text/") or not content_type:
+        return "text"
+    raise IngestError(f"不支持的文件类型: {content_type or filename}", status=415)
+
+
+def spool_chunks(chunks, max_bytes=INGEST_MAX_BYTES):
+    """把逐块到达的上传内容写入临时文件，返回已回到开头的文件对象"""
+    spool = tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_BYTES)
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            spool.close()
+            raise IngestError(f"文件超过大小上限 {max_bytes} 字节", status=413)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def aspool_chunks(chunks, max_bytes=INGEST_MAX_BYTES):
+    """spool_chunks 的异步版本，用于 ASGI 请求体流"""
+    spool = tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_BYTES)
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            spool.close()
+            raise IngestError(f"文件超过大小上限 {max_bytes} 字节", status=413)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+class MultipartUpload:
+    """
+    流式解析 multipart/form-data：文件字段逐块写入临时文件，超过大小上限时立即抛出 413，
+    不必等整个请求体到达；其余字段作为短文本保存在 fields 中
+    """
+
+    def __init__(self, content_type, max_bytes=INGEST_MAX_BYTES, file_field="file"):
+        if MultipartParser is None:
+            raise IngestError("未安装 python-multipart，无法解析表单上传", status=415)
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise IngestError("multipart 请求缺少 boundary")
+        self.max_bytes = max_bytes
+        self.file_field = file_field
+        self.file = None
+        self.filename = ""
+        self.content_type = ""
+        self.fields = {}
+        self.size = 0
+        self.other_bytes = 0
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        # 当前段写入的目标：文件、字段值（bytearray）或 None（丢弃）
+        self._target = None
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+            },
+        )
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._target = None
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name == self.file_field and b"filename" in options:
+            if self.file is not None:
+                # 只取第一个文件
+                return
+            self.file = tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_BYTES)
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+            self._target = self.file
+        elif name not in self.fields:
+            self.fields[name] = bytearray()
+            self._target = self.fields[name]
+
+    def _on_part_data(self, data, start, end):
+        if self._target is self.file and self.file is not None:
+            self.size += end - start
+            if self.size > self.max_bytes:
+                raise IngestError(f"文件超过大小上限 {self.max_bytes} 字节", status=413)
+            self.file.write(data[start:end])
+        elif self._target is not None:
+            self.other_bytes += end - start
+            if self.other_bytes > INGEST_FORM_OVERHEAD:
+                raise IngestError("表单字段过大", status=413)
+            self._target.extend(data[start:end])
+
+    def write(self, chunk):
+        try:
+            self._parser.write(chunk)
+        except IngestError:
+            raise
+        except Exception as e:
+            raise IngestError(f"无法解析 multipart 请求体: {e}")
+
+    def finish(self):
+        """请求体接收完毕：返回已回到开头的文件对象，缺少文件字段时抛出 400"""
+        self._parser.finalize()
+        if self.file is None:
+            raise IngestError(f"缺少上传文件字段 {self.file_field}")
+        self.file.seek(0)
+        return self.file
+
+    def field(self, name):
+        return bytes(self.fields.get(name, b"")).decode("utf-8", "replace")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+async def aspool_multipart(chunks, content_type, max_bytes=INGEST_MAX_BYTES):
+    """把逐块到达的 multipart 请求体解析为 MultipartUpload，文件内容写入临时文件"""
+    upload = MultipartUpload(content_type, max_bytes)
+    try:
+        async for chunk in chunks:
+            upload.write(chunk)
+        upload.finish()
+    except Exception:
+        upload.close()
+        raise
+    return upload
+
+
+def extract_plain(file, buffer):
+    # 增量解码，多字节字符跨块时不会出错；无法解码的字节替换为占位符
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    while True:
+        chunk = file.read(CHUNK_BYTES)
+        if not chunk:
+            buffer.add(decoder.decode(b"", final=True))
+            return
+        if not buffer.add(decoder.decode(chunk)):
+            return
+
+
+def extract_docx(file, buffer):
+    try:
+        archive = zipfile.ZipFile(file)
+        document = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError):
+        raise IngestError("无法读取 DOCX 文件")
+    with archive, document:
+        # 流式解析 XML，处理完的段落立即释放
+        for event, elem in ElementTree.iterparse(document, events=("end",)):
+            if elem.tag == W_NS + "t" and elem.text:
+                if not buffer.add(elem.text):
+                    return
+            elif elem.tag == W_NS + "tab":
+                buffer.add("\t")
+            elif elem.tag == W_NS + "p":
+                if not buffer.add("\n"):
+                    return
+                elem.clear()
+
+
+def extract_pdf(file, buffer):
+    if PdfReader is None:
+        raise IngestError("未安装 pypdf，无法抽取 PDF 文本", status=415)
+    try:
+        reader = PdfReader(file)
+        # 逐页抽取，达到字符上限后不再解析后续页面
+        for page in reader.pages:
+            if not buffer.add((page.extract_text() or "") + "\n"):
+                return
+    except IngestError:
+        raise
+    except Exception as e:
+        raise IngestError(f"无法读取 PDF 文件: {e}")
+
+
+EXTRACTORS = {"text": extract_plain, "docx": extract_docx, "pdf": extract_pdf}
+
+
+def extract_text(file, filename="", content_type="", max_chars=INGEST_MAX_CHARS):
+    """
+    从文件对象中抽取文本，返回 (text, stats)；
+    stats 包含格式、字节数、字符数、是否截断以及抽取耗时
+    """
+    fmt = detect_format(filename, content_type)
+    start = time.perf_counter()
+    buffer = TextBuffer(max_chars)
+    EXTRACTORS[fmt](file, buffer)
+    file.seek(0, os.SEEK_END)
+    stats = {
+        "format": fmt,
+        "filename": filename,
+        "bytes": file.tell(),
+        "chars": buffer.chars,
+        "truncated": buffer.truncated,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    return buffer.text(), stats
@@ -0,0 +1,349 @@
+"""
+持久化检测任务队列（单节点，SQLite）
+
+/jobs 接口提交任务后立即返回任务编号，由独立的 worker 进程从队列中领取并执行 main.py 的工作流，
+调用方轮询任务状态并获取结果；连接断开不影响任务执行，突发请求在队列中排队削峰。
+
+python jobs.py worker --processes 4
+python jobs.py stats
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+JOB_DB = os.getenv("JOB_DB", os.path.join(current_dir, "cache/jobs.db"))
+# 单个任务的最大执行次数（含首次）
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# 任务租约时长：worker 崩溃后超过该时长的任务会被其他 worker 重新领取
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+# 执行中的任务每隔该时长续租一次，应明显短于租约时长
+JOB_HEARTBEAT_SECONDS = float(
+    os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 3))
+)
+# 失败重试的退避基数，第 n 次重试前等待 JOB_RETRY_BACKOFF * 2 ** (n - 1) 秒
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+class IdempotencyConflict(ValueError):
+    """同一幂等键对应的任务内容不同"""
+
+
+def payload_digest(payload):
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """
+    SQLite 任务表：queued -> running -> done / failed
+    领取任务在 BEGIN IMMEDIATE 事务中完成，多个 worker 进程共享同一数据库文件不会重复领取；
+    每次领取 attempts 加一，新值即本次领取的令牌。续租、完成与失败都要求任务仍处于 running
+    且 attempts 等于令牌，租约过期后被其他 worker 重新领取的任务，原 worker 的结果不会覆盖新的执行
+    """
+
+    def __init__(self, path=JOB_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+              id TEXT PRIMARY KEY,
+              idempotency_key TEXT UNIQUE,
+              payload TEXT NOT NULL,
+              payload_digest TEXT NOT NULL,
+              status TEXT NOT NULL,
+              result TEXT,
+              error TEXT,
+              attempts INTEGER NOT NULL DEFAULT 0,
+              max_attempts INTEGER NOT NULL,
+              created_at REAL NOT NULL,
+              updated_at REAL NOT NULL,
+              available_at REAL NOT NULL,
+              locked_until REAL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, available_at)"
+        )
+
+    def submit(self, payload, idempotency_key=None, max_attempts=JOB_MAX_ATTEMPTS):
+        """
+        提交任务，返回 (job, created)；幂等键已存在时返回已有任务，
+        内容不同则抛出 IdempotencyConflict
+        """
+        digest = payload_digest(payload)
+        now = time.time()
+        with self._lock:
+            if idempotency_key is not None:
+                job = self._existing(idempotency_key, digest)
+                if job is not None:
+                    return job, False
+            job_id = uuid.uuid4().hex
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, idempotency_key, payload, payload_digest, status, attempts, max_attempts, created_at, updated_at, available_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', 0, ?, ?, ?, ?)",
+                    (
+                        job_id,
+                        idempotency_key,
+                        json.dumps(payload, ensure_ascii=False),
+                        digest,
+                        max_attempts,
+                        now,
+                        now,
+                        now,
+                    ),
+                )
+            except sqlite3.IntegrityError:
+                # 其他进程同时以相同幂等键提交
+                return self._existing(idempotency_key, digest), False
+            return self._get(job_id), True
+
+    def _existing(self, idempotency_key, digest):
+        job = self._get_by_key(idempotency_key)
+        if job is not None and job["payload_digest"] != digest:
+            raise IdempotencyConflict("幂等键已用于内容不同的任务")
+        return job
+
+    def claim(self, lease=JOB_LEASE_SECONDS):
+        """
+        领取一个可执行的任务：排队中且已到重试时间，或租约已过期（worker 崩溃）的执行中任务；
+        返回 (job, token)，没有可执行的任务时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 租约过期且已用完执行次数的任务不再重试
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'worker 租约过期', locked_until = NULL, updated_at = ? "
+                    "WHERE status = 'running' AND locked_until < ? AND attempts >= max_attempts",
+                    (now, now),
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'running' AND locked_until < ?) "
+                    "ORDER BY available_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                    "locked_until = ?, updated_at = ? WHERE id = ?",
+                    (now + lease, now, row[0]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            job = self._get(row[0])
+            return job, job["attempts"]
+
+    def heartbeat(self, job_id, token, lease=JOB_LEASE_SECONDS):
+        """续租；任务已被其他 worker 重新领取或已结束时返回 False"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET locked_until = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (now + lease, now, job_id, token),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, token, result):
+        """记录结果；令牌已失效（任务被重新领取）时不写入并返回 False"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, locked_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, token),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, token, error):
+        """记录失败；未达最大次数时按指数退避重新排队。令牌已失效时不写入并返回 False"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT max_attempts FROM jobs WHERE id = ? AND status = 'running' AND attempts = ?",
+                (job_id, token),
+            ).fetchone()
+            if row is None:
+                return False
+            if token < row[0]:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, locked_until = NULL, available_at = ?, updated_at = ? "
+                    "WHERE id = ? AND status = 'running' AND attempts = ?",
+                    (error, now + JOB_RETRY_BACKOFF * 2 ** (token - 1), now, job_id, token),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, locked_until = NULL, updated_at = ? "
+                    "WHERE id = ? AND status = 'running' AND attempts = ?",
+                    (error, now, job_id, token),
+                )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get(job_id)
+
+    def _get(self, job_id):
+        return self._row(
+            self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        )
+
+    def _get_by_key(self, idempotency_key):
+        return self._row(
+            self._conn.execute(
+                "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+            )
+        )
+
+    @staticmethod
+    def _row(cursor):
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([column[0] for column in cursor.description], row))
+        job["payload"] = json.loads(job["payload"])
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(dict(rows))
+        return counts
+
+
+def job_status(job):
+    """返回给调用方的任务状态（不含文档内容与结果）"""
+    return {
+        key: job[key]
+        for key in (
+            "id",
+            "status",
+            "attempts",
+            "max_attempts",
+            "error",
+            "created_at",
+            "updated_at",
+        )
+    }
+
+
+class IncompleteVerdict(RuntimeError):
+    """有节点解析失败，判定结果不完整"""
+
+
+def run_job(job):
+    """
+    以任务编号为 thread_id 执行工作流：重试时从上次最后完成的节点继续；
+    判定结果不完整且仍有重试次数时抛出异常，由队列重新排队
+    """
+    from batch import format_result, initial_input
+    from main import invoke_resumable
+    from nodes import verdict_complete
+    from usage import track_request
+    from tracing import traced
+
+    item = job["payload"]
+    # 最后一次执行：任务随后进入 done 或 failed，不会再续跑，检查点一并删除
+    final = job["attempts"] >= job["max_attempts"]
+    with track_request() as request_usage, traced("job", job_id=job["id"]):
+        state = invoke_resumable(initial_input(item, None), job["id"], final=final)
+    if not verdict_complete(state) and not final:
+        raise IncompleteVerdict("判定结果不完整")
+    return format_result(0, item, state, request_usage)
+
+
+@contextlib.contextmanager
+def lease_heartbeat(queue, job_id, token, interval=JOB_HEARTBEAT_SECONDS):
+    """任务执行期间在后台线程中定期续租，执行时间超过租约时长也不会被其他 worker 重新领取"""
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(interval):
+            if not queue.heartbeat(job_id, token):
+                return
+
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def worker_loop(path=JOB_DB, poll_interval=JOB_POLL_INTERVAL, stop=None):
+    """worker 进程主循环：领取任务并执行，出错时交由队列决定重试或标记失败"""
+    queue = JobQueue(path)
+    while stop is None or not stop.is_set():
+        claimed = queue.claim()
+        if claimed is None:
+            time.sleep(poll_interval)
+            continue
+        job, token = claimed
+        try:
+            with lease_heartbeat(queue, job["id"], token):
+                result = run_job(job)
+        except Exception as e:
+            queue.fail(job["id"], token, f"{type(e).__name__}: {str(e)}")
+        else:
+            queue.complete(job["id"], token, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="持久化检测任务队列")
+    parser.add_argument("command", choices=["worker", "stats"])
+    parser.add_argument("--db", default=JOB_DB, help="任务数据库路径")
+    parser.add_argument("--processes", type=int, default=1, help="worker 进程数")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(JobQueue(args.db).stats(), ensure_ascii=False))
+        return
+    processes = [
+        multiprocessing.Process(target=worker_loop, args=(args.db,), daemon=True)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
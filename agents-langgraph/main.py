@@ -1,54 +1,102 @@
+import os
+import sqlite3
+import threading
 from typing import TypedDict
 from nodes import (
+    PARSE_FAILED,
+    verdict_complete,
     start_node,
+    cache_lookup_node,
+    cache_store_node,
     hard_condition_node,
+    prescreen_node,
     secret_analysis_node,
     public_analysis_node,
     decision_review_node,
 )
 from langgraph.graph import StateGraph, END
+from metrics import timed_node
+from tracing import trace_event
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 检查点：按 thread_id 持久化每个节点完成后的状态，设置 GRAPH_CHECKPOINT=0 关闭
+GRAPH_CHECKPOINT = os.getenv("GRAPH_CHECKPOINT", "1") != "0"
+CHECKPOINT_PATH = os.getenv(
+    "CHECKPOINT_PATH", os.path.join(current_dir, "cache/checkpoints.db")
+)
 
 
 # 定义工作流状态
 class State(TypedDict):
     doc_title: str  # 文档标题
-    doc_content: str  # 文档内容
+    doc_content: str  # 文档内容（规范化后）
+    raw_content: str  # 原始文档内容，用于报告词库命中位置
     current_node: str  # 当前节点（用于路由）
     is_sensitive: bool  # 是否涉密
     evidence: str  # 证据链
     secret_analysis_result: dict  # 语义检测结果
     public_analysis_result: dict  # 非涉密证明结果
     confidence: int  # 置信度
+    lexicon_version: str  # 词库版本
+    cache_key: str  # 判定结果缓存键
+    cache_hit: bool  # 是否命中判定结果缓存
+    prescreen_score: float  # 本地预筛模型判定为公开的概率
+    hard_condition: dict  # 预先完成的硬条件检测结果（语料扫描时由工作进程计算）
+
 
+# 命中缓存直接结束，否则进入硬条件检测
+def route_after_cache(state: State):
+    if state.get("cache_hit"):
+        return END
+    return "hard_condition_node"
 
-# 如果关键词检测到涉密内容，直接进入决策节点；否则，继续语义检测
+
+# 如果关键词检测到涉密内容，直接进入决策节点；否则，进入本地预筛
 def route_after_hard_condition(state: State):
     is_sensitive = state.get("is_sensitive")
     # 如果涉密，直接进入决策节点
     if is_sensitive:
         return "agent_decision"
-    # 否则，继续深度语义检测
     else:
-        return "agent_semantics"
+        return "prescreen_node"
+
+
+# 预筛判定为公开则直接写入缓存并结束；否则，并行执行正向与反向分析
+def route_after_prescreen(state: State):
+    if state.get("current_node") == "prescreen_node":
+        return "cache_store"
+    # 两个分析节点互不依赖，同时执行
+    return ["agent_semantics", "agent_non_secret_proof"]
 
 
 # 工作流
 workflow = StateGraph(State)
-workflow.add_node("start_node", start_node)
-workflow.add_node("hard_condition_node", hard_condition_node)
-workflow.add_node("agent_semantics", secret_analysis_node)
-workflow.add_node("agent_non_secret_proof", public_analysis_node)
-workflow.add_node("agent_decision", decision_review_node)
+workflow.add_node("start_node", timed_node("start_node", start_node))
+workflow.add_node("verdict_cache", timed_node("verdict_cache", cache_lookup_node))
+workflow.add_node("hard_condition_node", timed_node("hard_condition_node", hard_condition_node))
+workflow.add_node("prescreen_node", timed_node("prescreen_node", prescreen_node))
+workflow.add_node("agent_semantics", timed_node("agent_semantics", secret_analysis_node))
+workflow.add_node("agent_non_secret_proof", timed_node("agent_non_secret_proof", public_analysis_node))
+workflow.add_node("agent_decision", timed_node("agent_decision", decision_review_node))
+workflow.add_node("cache_store", timed_node("cache_store", cache_store_node))
 
 # 设定启动节点
 workflow.set_entry_point("start_node")
 
+# 第零步：按规范化内容查询判定结果缓存，命中则直接返回
+workflow.add_edge("start_node", "verdict_cache")
+workflow.add_conditional_edges(
+    "verdict_cache",
+    route_after_cache,
+    {END: END, "hard_condition_node": "hard_condition_node"},
+)
+
 # 第一步：硬条件检测（关键词、短语）
 # 关键词检测：正则匹配
 # 短语检测：语义相似度匹配
 # 如果检测到关键词或短语，直接进入判定为涉密文件进入复查阶段
 # 否则，进行深度分析
-workflow.add_edge("start_node", "hard_condition_node")
 
 # 第二步：关键词检测后的条件路由
 workflow.add_conditional_edges(
@@ -56,13 +104,103 @@ workflow.add_conditional_edges(
     route_after_hard_condition,
     {
         "agent_decision": "agent_decision",  # 如果检测到关键词，直接决策
-        "agent_semantics": "agent_semantics",  # 否则继续语义检测
+        "prescreen_node": "prescreen_node",  # 否则进入本地预筛
     },
 )
 
-workflow.add_edge("agent_semantics", "agent_non_secret_proof")
-workflow.add_edge("agent_non_secret_proof", "agent_decision")
-workflow.add_edge("agent_decision", END)
+# 第三步：本地预筛，未启用或没有把握时并行执行语义检测与非涉密证明
+workflow.add_conditional_edges(
+    "prescreen_node",
+    route_after_prescreen,
+    {
+        "cache_store": "cache_store",
+        "agent_semantics": "agent_semantics",
+        "agent_non_secret_proof": "agent_non_secret_proof",
+    },
+)
+
+# 第四步：两个分析节点都完成后，在决策节点汇合
+workflow.add_edge(["agent_semantics", "agent_non_secret_proof"], "agent_decision")
+workflow.add_edge("agent_decision", "cache_store")
+workflow.add_edge("cache_store", END)
 
 # 编译工作流
 app = workflow.compile()
+
+# 带检查点的工作流，用于可重试的请求（见 invoke_resumable）；
+# 首次使用时才创建，只导入 app 的模块不会生成检查点数据库
+_resumable = None
+_resumable_lock = threading.Lock()
+
+
+def resumable_app():
+    """返回 (带检查点的工作流, 检查点存储)"""
+    global _resumable
+    if _resumable is None:
+        with _resumable_lock:
+            if _resumable is None:
+                from langgraph.checkpoint.sqlite import SqliteSaver
+
+                os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+                checkpointer = SqliteSaver(
+                    sqlite3.connect(CHECKPOINT_PATH, check_same_thread=False)
+                )
+                _resumable = (workflow.compile(checkpointer=checkpointer), checkpointer)
+    return _resumable
+
+
+def thread_config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+# 上次运行的续跑位置，无需续跑时返回 None
+def resume_point(graph, config):
+    snapshot = graph.get_state(config)
+    if not snapshot.values:
+        return None
+    # 节点抛出异常（超时、限流等）中断：从最新检查点继续，已完成节点的结果直接复用
+    if snapshot.next:
+        return snapshot.config
+    state = snapshot.values
+    if verdict_complete(state):
+        return None
+    # 已运行结束但有节点解析失败：回到失败节点之前的检查点重放
+    # 决策评审失败时两个分析结果直接复用；分析节点失败时重放两个分析节点，解析成功的一方命中 LLM 响应缓存
+    analysis_failed = any(
+        state.get(key, {}).get("evidence") == PARSE_FAILED
+        for key in ("secret_analysis_result", "public_analysis_result")
+    )
+    target = (
+        {"agent_semantics", "agent_non_secret_proof"}
+        if analysis_failed
+        else {"agent_decision"}
+    )
+    for checkpoint in graph.get_state_history(config):
+        if target <= set(checkpoint.next):
+            return checkpoint.config
+    return None
+
+
+def invoke_resumable(input_state, thread_id, final=False):
+    """
+    以 thread_id 为键带检查点执行工作流；同一 thread_id 重试时从上次最后完成的节点继续，
+    不再重复已完成的 LLM 调用。结果完整时删除该 thread 的检查点；
+    final=True 表示不会再重试（最后一次执行），无论成功、结果不完整还是抛出异常都删除检查点
+    """
+    if not GRAPH_CHECKPOINT:
+        return app.invoke(input_state)
+    graph, checkpointer = resumable_app()
+    config = thread_config(thread_id)
+    complete = False
+    try:
+        resume = resume_point(graph, config)
+        if resume is None:
+            state = graph.invoke(input_state, config)
+        else:
+            trace_event("checkpoint_resume", thread_id=thread_id)
+            state = graph.invoke(None, resume)
+        complete = verdict_complete(state)
+    finally:
+        if complete or final:
+            checkpointer.delete_thread(thread_id)
+    return state
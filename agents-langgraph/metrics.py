@@ -0,0 +1,138 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+from tracing import span
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+NODE_LATENCY = Histogram(
+    "agent_node_latency_seconds", "单个节点耗时", ["node"], buckets=LATENCY_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    "agent_request_latency_seconds",
+    "接口端到端耗时（流式接口为整条流的持续时间）",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+# 快速路径命中率 = outcome="hit" / 全部
+HARD_CONDITION = Counter(
+    "agent_hard_condition_total", "硬条件检测次数，按是否命中直接判定", ["outcome"]
+)
+# 预筛跳过率 = outcome="skip" / 全部
+PRESCREEN = Counter(
+    "agent_prescreen_total", "本地预筛次数，按是否跳过 LLM 分析", ["outcome"]
+)
+PARSE_FAILURES = Counter(
+    "agent_json_parse_failures_total", "LLM 输出 JSON 解析失败次数", ["node"]
+)
+LLM_ERRORS = Counter(
+    "agent_llm_errors_total", "LLM 调用失败次数", ["kind"]
+)
+# 对冲率 = outcome 为 primary_won / hedge_won / failed 的调用 / 全部；胜出率 = outcome="hedge_won" / 发出对冲的调用
+LLM_HEDGE = Counter(
+    "agent_llm_hedge_total",
+    "LLM 对冲调用次数，按结果区分（not_hedged / primary_won / hedge_won / failed / limited）",
+    ["outcome"],
+)
+LEXICON_RELOAD_FAILURES = Counter(
+    "agent_lexicon_reload_failures_total", "词库重新加载失败次数（继续使用旧词库）", ["error"]
+)
+# 长文档提前结束时的分块调用：abandoned 为已发出、结果被丢弃的调用，skipped 为未发出的分块
+CHUNK_EARLY_EXIT = Counter(
+    "agent_chunk_early_exit_total", "长文档提前结束时未使用的分块调用数", ["outcome"]
+)
+INFLIGHT_STREAMS = Gauge(
+    "agent_inflight_streams", "正在进行中的流式响应数", ["endpoint"]
+)
+
+
+def record_hard_condition(hit):
+    HARD_CONDITION.labels("hit" if hit else "miss").inc()
+
+
+def record_prescreen(skipped):
+    PRESCREEN.labels("skip" if skipped else "pass").inc()
+
+
+def record_hedge(outcome):
+    LLM_HEDGE.labels(outcome).inc()
+
+
+def record_lexicon_reload_failure(error):
+    LEXICON_RELOAD_FAILURES.labels(type(error).__name__).inc()
+
+
+def record_chunk_early_exit(abandoned, skipped):
+    CHUNK_EARLY_EXIT.labels("abandoned").inc(abandoned)
+    CHUNK_EARLY_EXIT.labels("skipped").inc(skipped)
+
+
+def record_parse_failure(node):
+    PARSE_FAILURES.labels(node).inc()
+
+
+def record_llm_error(error):
+    """按错误类型区分限流、超时与其他错误"""
+    name = type(error).__name__
+    status = getattr(error, "status_code", None)
+    if status == 429 or name == "RateLimitError":
+        kind = "rate_limit"
+    elif "Timeout" in name:
+        kind = "timeout"
+    else:
+        kind = "other"
+    LLM_ERRORS.labels(kind).inc()
+
+
+@contextmanager
+def observe_node(node):
+    """记录节点耗时，开启追踪时同时生成该节点的 span"""
+    start = time.perf_counter()
+    try:
+        with span(node):
+            yield
+    finally:
+        NODE_LATENCY.labels(node).observe(time.perf_counter() - start)
+
+
+def timed_node(node, fn):
+    """包装节点函数，记录节点耗时（支持同步与异步函数）"""
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with observe_node(node):
+                return await fn(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with observe_node(node):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def track_stream(endpoint, generator):
+    """包装流式响应生成器，统计在途流数量和整条流的耗时"""
+    INFLIGHT_STREAMS.labels(endpoint).inc()
+    start = time.perf_counter()
+    try:
+        yield from generator
+    finally:
+        INFLIGHT_STREAMS.labels(endpoint).dec()
+        REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+
+
+async def atrack_stream(endpoint, generator):
+    INFLIGHT_STREAMS.labels(endpoint).inc()
+    start = time.perf_counter()
+    try:
+        async for item in generator:
+            yield item
+    finally:
+        INFLIGHT_STREAMS.labels(endpoint).dec()
+        REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
@@ -0,0 +1,270 @@
+"""
+本地 CPU 预筛分类器：字符 n-gram 哈希特征 + 逻辑回归
+
+位于硬条件检测之后、LLM 分析之前，模型有把握判定为公开（非涉密）的文档直接给出结论，
+不再调用 LLM。模型文件不存在或 PRESCREEN=0 时不启用。
+
+训练与服务使用同一份文本：规范化后的文档正文（test 表的 summary，即工作流中的 doc_content）。
+train 先做 k 折交叉验证报告留出集上的误跳过率，再用全部数据训练并保存模型。
+
+python prescreen.py train --db ../db/test.db --output models/prescreen.npz --folds 5
+python prescreen.py cv --db ../db/test.db --threshold 0.95
+python prescreen.py eval --db ../db/test.db --threshold 0.95
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import numpy as np
+from utils.normalize import content_normalizer
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(current_dir, "..", "db", "test.db")
+
+PRESCREEN_ENABLED = os.getenv("PRESCREEN", "1") != "0"
+PRESCREEN_MODEL = os.getenv(
+    "PRESCREEN_MODEL", os.path.join(current_dir, "models", "prescreen.npz")
+)
+# 判定为公开的概率不低于该值时跳过 LLM 分析
+PRESCREEN_THRESHOLD = float(os.getenv("PRESCREEN_THRESHOLD", "0.95"))
+
+# 特征空间大小为 2 ** HASH_BITS
+HASH_BITS = 18
+NGRAM_ORDERS = (1, 2, 3)
+_PRIME = np.uint64(1000003)
+# 乘法移位哈希的乘数（64 位黄金分割数）
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def ngram_hashes(text, orders=NGRAM_ORDERS, bits=HASH_BITS):
+    """文本中全部字符 n-gram 的哈希桶编号，按码位整体向量化计算"""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    parts = []
+    with np.errstate(over="ignore"):
+        for n in orders:
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            # 以 n 为种子，不同阶的 n-gram 落入不同的桶
+            h = np.full(count, n, dtype=np.uint64)
+            for k in range(n):
+                h = h * _PRIME + codes[k : k + count]
+            parts.append((h * _MIX) >> np.uint64(64 - bits))
+    if not parts:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(parts).astype(np.int64)
+
+
+def vectorize(texts, bits=HASH_BITS):
+    """
+    批量提取特征，返回 CSR 形式的 (indptr, indices, data)；
+    词频取 1 + log(tf) 后按文档做 L2 归一化
+    """
+    indptr = [0]
+    indices = []
+    data = []
+    for text in texts:
+        buckets, counts = np.unique(ngram_hashes(text, bits=bits), return_counts=True)
+        values = 1 + np.log(counts)
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values = values / norm
+        indices.append(buckets)
+        data.append(values)
+        indptr.append(indptr[-1] + len(buckets))
+    if indices:
+        indices = np.concatenate(indices)
+        data = np.concatenate(data)
+    else:
+        indices = np.empty(0, dtype=np.int64)
+        data = np.empty(0)
+    return np.asarray(indptr), indices, data
+
+
+def row_ids(indptr):
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+def sigmoid(z):
+    return 1 / (1 + np.exp(-z))
+
+
+class HashingClassifier:
+    """正类为涉密；predict_proba 返回涉密概率"""
+
+    def __init__(self, weights=None, bias=0.0, bits=HASH_BITS):
+        self.bits = bits
+        self.weights = weights if weights is not None else np.zeros(2**bits)
+        self.bias = float(bias)
+
+    def decision_function(self, texts):
+        indptr, indices, data = vectorize(texts, self.bits)
+        scores = np.bincount(
+            row_ids(indptr),
+            weights=self.weights[indices] * data,
+            minlength=len(indptr) - 1,
+        )
+        return scores + self.bias
+
+    def predict_proba(self, texts):
+        return sigmoid(self.decision_function(texts))
+
+    def fit(self, texts, labels, epochs=200, lr=1.0, l2=1e-4):
+        """全量梯度下降训练逻辑回归，正负样本按数量加权"""
+        indptr, indices, data = vectorize(texts, self.bits)
+        rows = row_ids(indptr)
+        y = np.asarray(labels, dtype=float)
+        n = len(y)
+        positives = max(y.sum(), 1)
+        negatives = max(n - y.sum(), 1)
+        sample_weight = np.where(y == 1, n / (2 * positives), n / (2 * negatives))
+        for _ in range(epochs):
+            scores = np.bincount(rows, weights=self.weights[indices] * data, minlength=n)
+            error = (sigmoid(scores + self.bias) - y) * sample_weight / n
+            gradient = np.bincount(
+                indices, weights=data * error[rows], minlength=2**self.bits
+            )
+            self.weights -= lr * (gradient + l2 * self.weights)
+            self.bias -= lr * error.sum()
+        return self
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            path, weights=self.weights, bias=self.bias, bits=self.bits
+        )
+
+    @classmethod
+    def load(cls, path):
+        model = np.load(path)
+        return cls(model["weights"], float(model["bias"]), int(model["bits"]))
+
+
+def load_classifier():
+    if not PRESCREEN_ENABLED or not os.path.exists(PRESCREEN_MODEL):
+        return None
+    return HashingClassifier.load(PRESCREEN_MODEL)
+
+
+def model_version():
+    """预筛模型文件摘要与阈值；模型或阈值变化时判定结果缓存随之失效，未启用时为 off"""
+    if classifier is None:
+        return "off"
+    with open(PRESCREEN_MODEL, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:8]
+    return f"{digest}@{PRESCREEN_THRESHOLD}"
+
+
+classifier = load_classifier()
+PRESCREEN_VERSION = model_version()
+
+
+def public_scores(texts):
+    """批量计算文档为公开（非涉密）的概率；未启用预筛时返回 None"""
+    if classifier is None:
+        return None
+    return 1 - classifier.predict_proba(texts)
+
+
+def load_labelled(db_path):
+    # 与工作流一致：只用文档正文（doc_content），并做同样的内容规范化
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT summary, is_sensitive FROM test ORDER BY id").fetchall()
+    conn.close()
+    texts = [content_normalizer(summary) for summary, _ in rows]
+    labels = [int(bool(label)) for _, label in rows]
+    return texts, labels
+
+
+def skip_report(public, labels, threshold):
+    """
+    给定阈值下的跳过统计；误跳过率 = 被跳过的涉密文档 / 全部涉密文档，
+    即预筛让涉密文档漏过 LLM 分析的比例
+    """
+    skipped = np.asarray(public) >= threshold
+    labels = np.asarray(labels)
+    sensitive = int((labels == 1).sum())
+    missed = int((skipped & (labels == 1)).sum())
+    return {
+        "documents": len(labels),
+        "threshold": threshold,
+        "skipped": int(skipped.sum()),
+        "skip_rate": float(skipped.mean()) if len(labels) else None,
+        "missed_sensitive": missed,
+        "false_skip_rate": missed / sensitive if sensitive else None,
+    }
+
+
+def evaluate(model, texts, labels, threshold):
+    """模型在给定文档上的跳过统计（训练集上评估会低估误跳过率，应以 cross_validate 为准）"""
+    return skip_report(1 - model.predict_proba(texts), labels, threshold)
+
+
+def cross_validate(texts, labels, threshold, folds=5, seed=0, **fit_args):
+    """
+    分层 k 折交叉验证：每折用其余数据训练，在留出的一折上打分，
+    汇总全部留出分数后计算跳过统计
+    """
+    labels = np.asarray(labels)
+    rng = np.random.default_rng(seed)
+    fold_of = np.empty(len(labels), dtype=int)
+    # 涉密与公开文档分别打乱后轮流分配到各折，每折的正负比例与整体一致
+    for label in (0, 1):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        fold_of[members] = np.arange(len(members)) % folds
+    public = np.empty(len(labels))
+    for fold in range(folds):
+        held_out = np.flatnonzero(fold_of == fold)
+        train = np.flatnonzero(fold_of != fold)
+        if not len(held_out) or not len(train):
+            continue
+        model = HashingClassifier().fit(
+            [texts[i] for i in train], labels[train], **fit_args
+        )
+        public[held_out] = 1 - model.predict_proba([texts[i] for i in held_out])
+    report = skip_report(public, labels, threshold)
+    report["folds"] = folds
+    return report
+
+
+def print_report(title, report):
+    false_skip = report["false_skip_rate"]
+    print(
+        f"{title}：文档 {report['documents']} 篇，阈值 {report['threshold']}，"
+        f"跳过 {report['skipped']} 篇（{report['skip_rate']:.1%}），"
+        f"其中实为涉密 {report['missed_sensitive']} 篇"
+        + (f"（误跳过率 {false_skip:.2%}）" if false_skip is not None else "")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地预筛分类器")
+    parser.add_argument("command", choices=["train", "cv", "eval"])
+    parser.add_argument("--db", default=DEFAULT_DB, help="标注数据库路径（test 表）")
+    parser.add_argument("--output", default=PRESCREEN_MODEL, help="模型文件路径")
+    parser.add_argument("--threshold", type=float, default=PRESCREEN_THRESHOLD)
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--lr", type=float, default=1.0)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--folds", type=int, default=5, help="交叉验证折数，train 时设为 0 跳过")
+    args = parser.parse_args()
+
+    texts, labels = load_labelled(args.db)
+    fit_args = {"epochs": args.epochs, "lr": args.lr, "l2": args.l2}
+    if args.command in ("train", "cv") and args.folds > 1:
+        report = cross_validate(texts, labels, args.threshold, args.folds, **fit_args)
+        print_report(f"{args.folds} 折交叉验证（留出集）", report)
+    if args.command == "train":
+        model = HashingClassifier().fit(texts, labels, **fit_args)
+        model.save(args.output)
+        print(f"模型已写入 {args.output}")
+    elif args.command == "eval":
+        model = HashingClassifier.load(args.output)
+        print_report("评估", evaluate(model, texts, labels, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+语料扫描：遍历目录树，逐个文件检测是否涉密
+
+文本抽取与硬条件检测（含本地预筛打分）在进程池中执行，之后以有限并发交给 main.py 编译后的工作流完成 LLM 分析；
+进度按文件记录在 SQLite 中，中断后重新运行会跳过已完成且未修改的文件；结果逐行追加写入 JSONL。
+
+python scan.py /data/share --output scan_results.jsonl --checkpoint scan_checkpoint.db --workers 4 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from ingest import EXTENSIONS, extract_text
+
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", str(os.cpu_count() or 1)))
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "8"))
+
+
+class Checkpoint:
+    """
+    扫描进度：每个文件一行，按路径、大小和修改时间判断是否已完成；
+    仅 done 状态的文件会被跳过，出错或判定结果不完整的文件下次运行时重试
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scan_files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, status TEXT, updated_at REAL)"
+        )
+        self.conn.commit()
+
+    def is_done(self, path, size, mtime):
+        row = self.conn.execute(
+            "SELECT size, mtime, status FROM scan_files WHERE path = ?", (path,)
+        ).fetchone()
+        return row is not None and row == (size, mtime, "done")
+
+    def mark(self, path, size, mtime, status):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scan_files VALUES (?, ?, ?, ?, ?)",
+            (path, size, mtime, status, time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def iter_files(root):
+    """按目录顺序产出可抽取文本的文件路径"""
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in EXTENSIONS:
+                yield os.path.join(directory, filename)
+
+
+def prepare_file(path):
+    """
+    在工作进程中执行的 CPU 阶段：抽取文本、硬条件检测与本地预筛打分，
+    结果随初始状态传入工作流，工作流中不再重复计算
+    """
+    from nodes import hard_condition_check, normalize_content
+    from prescreen import public_scores
+    from utils.lexicon import registry
+
+    timings = {}
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        text, stats = extract_text(f, os.path.basename(path))
+    timings["extract"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hard_condition = hard_condition_check(text, registry.current())
+    timings["hard_condition"] = time.perf_counter() - start
+
+    prescreen_score = None
+    if not hard_condition["is_sensitive"] and text.strip():
+        start = time.perf_counter()
+        scores = public_scores([normalize_content(text)])
+        if scores is not None:
+            prescreen_score = float(scores[0])
+            timings["prescreen"] = time.perf_counter() - start
+    return {
+        "text": text,
+        "extract": stats,
+        "hard_condition": hard_condition,
+        "prescreen_score": prescreen_score,
+        "timings": timings,
+    }
+
+
+async def scan_file(workflow, pool, llm_slots, path):
+    from batch import RESULT_KEYS
+    from nodes import verdict_complete
+    from usage import track_request
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    record = {"path": path}
+    timings = {}
+    try:
+        prepared = await loop.run_in_executor(pool, prepare_file, path)
+        record["extract"] = prepared["extract"]
+        timings.update(prepared["timings"])
+        if prepared["text"].strip():
+            state = {
+                "doc_title": os.path.basename(path),
+                "doc_content": prepared["text"],
+                "hard_condition": prepared["hard_condition"],
+            }
+            if prepared["prescreen_score"] is not None:
+                state["prescreen_score"] = prepared["prescreen_score"]
+            # 硬条件已判定涉密的文件不会调用 LLM，不占用并发名额
+            slot = contextlib.nullcontext()
+            if not prepared["hard_condition"]["is_sensitive"]:
+                slot = llm_slots
+            async with slot:
+                graph_start = time.perf_counter()
+                with track_request() as request_usage:
+                    final = await workflow.ainvoke(state)
+                timings["graph"] = time.perf_counter() - graph_start
+            record["result"] = {key: final[key] for key in RESULT_KEYS if key in final}
+            record["usage"] = request_usage.summary()["total"]
+            if not verdict_complete(final):
+                # 有节点解析失败，记为出错，下次运行时重新检测
+                record["incomplete"] = True
+        else:
+            # 扫描件等未抽取到文本的文件，无法检测
+            record["empty"] = True
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {str(e)}"
+    timings["total"] = time.perf_counter() - start
+    record["timings"] = {key: round(value, 4) for key, value in timings.items()}
+    return record
+
+
+async def scan(root, output, checkpoint, workers=SCAN_WORKERS, concurrency=SCAN_CONCURRENCY):
+    """扫描目录树，返回本次运行的统计"""
+    from main import app as workflow
+
+    llm_slots = asyncio.Semaphore(concurrency)
+    # 在途文件数上限：进程池与 LLM 阶段都保持忙碌，同时不会一次性把整个目录的文本读入内存
+    max_pending = workers * 2 + concurrency
+    stats = {"scanned": 0, "skipped": 0, "errors": 0, "sensitive": 0}
+    files = {}
+    pending = set()
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    def finish(record):
+        # 先写结果再记录进度：中断时最多重复输出一行，不会丢失结果
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        size, mtime = files.pop(record["path"])
+        failed = "error" in record or record.get("incomplete", False)
+        checkpoint.mark(record["path"], size, mtime, "error" if failed else "done")
+        stats["scanned"] += 1
+        stats["errors"] += failed
+        stats["sensitive"] += bool(record.get("result", {}).get("is_sensitive"))
+
+    try:
+        with open(output, "a", encoding="utf-8") as out:
+            for path in iter_files(root):
+                stat = os.stat(path)
+                if checkpoint.is_done(path, stat.st_size, stat.st_mtime):
+                    stats["skipped"] += 1
+                    continue
+                if len(pending) >= max_pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        finish(task.result())
+                files[path] = (stat.st_size, stat.st_mtime)
+                pending.add(
+                    asyncio.ensure_future(scan_file(workflow, pool, llm_slots, path))
+                )
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    finish(task.result())
+    finally:
+        for task in pending:
+            task.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目录树涉密文件扫描")
+    parser.add_argument("root", help="待扫描的目录")
+    parser.add_argument("--output", default="scan_results.jsonl", help="结果文件（JSONL，追加写入）")
+    parser.add_argument("--checkpoint", default="scan_checkpoint.db", help="进度数据库路径")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="文本抽取与硬条件检测的进程数")
+    parser.add_argument("--concurrency", type=int, default=SCAN_CONCURRENCY, help="LLM 分析并发数")
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(args.checkpoint)
+    start = time.perf_counter()
+    try:
+        stats = asyncio.run(
+            scan(args.root, args.output, checkpoint, args.workers, args.concurrency)
+        )
+    finally:
+        checkpoint.close()
+    print(
+        f"扫描 {stats['scanned']} 个文件（跳过已完成 {stats['skipped']} 个），"
+        f"涉密 {stats['sensitive']} 个，出错 {stats['errors']} 个，"
+        f"耗时 {time.perf_counter() - start:.1f} 秒"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
-from fastapi import FastAPI
+import asyncio
+import json
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from langserve import add_routes
+from prometheus_client import make_asgi_app
+from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
 from main import app as workflow
+from batch import arun_batch, aiter_ndjson, parse_item
+from check import check_events, upload_events
+from ingest import (
+    INGEST_FORM_OVERHEAD,
+    INGEST_MAX_BYTES,
+    IngestError,
+    aspool_chunks,
+    aspool_multipart,
+    detect_format,
+)
+from usage import usage_stats
+from prompts import prompt_stats
+from metrics import atrack_stream
+from jobs import IdempotencyConflict, JobQueue, job_status
 
 app = FastAPI(title="Agent API")
 
@@ -17,6 +37,177 @@ app.add_middleware(
 
 add_routes(app, workflow, path="/agent")
 
+# Prometheus 指标
+app.mount("/metrics", make_asgi_app())
+
+# 异步检测任务队列，由 python jobs.py worker 启动的 worker 进程执行
+job_queue = JobQueue()
+
+
+class CheckRequest(BaseModel):
+    doc_title: str = ""
+    doc_content: str
+    # 为 True 时在 final 事件中附带本次请求的 span 树
+    trace: bool = False
+    # 为 True 时只返回裁决，解析出 result 与 result_confidence 后立即停止生成
+    verdict_only: bool = False
+
+
+@app.post("/check")
+async def check(body: CheckRequest):
+    """流式检测，事件类型与 flask 版 /check 一致（progress / stream_token / final）"""
+
+    async def generate():
+        events = check_events(
+            body.doc_title, body.doc_content, body.trace, body.verdict_only
+        )
+        async for event in atrack_stream("check", events):
+            yield {"data": json.dumps(event, ensure_ascii=False)}
+
+    return EventSourceResponse(generate(), headers={"X-Accel-Buffering": "no"})
+
+
+@app.post("/check/upload")
+async def check_upload(
+    request: Request,
+    filename: str = "",
+    doc_title: str = "",
+    trace: bool = False,
+    verdict_only: bool = False,
+):
+    """
+    上传文档检测：multipart/form-data（字段 file）或直接以文件内容为请求体
+    （按 Content-Type 或 filename 参数识别 PDF / DOCX / 纯文本）；
+    事件与 /check 相同，另有 extract 阶段报告抽取耗时
+    """
+    content_type = request.headers.get("content-type", "")
+    multipart = content_type.startswith("multipart/form-data")
+    try:
+        # 声明的请求体长度已超过上限时直接拒绝，不读取请求体
+        limit = INGEST_MAX_BYTES + (INGEST_FORM_OVERHEAD if multipart else 0)
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            raise IngestError(f"文件超过大小上限 {INGEST_MAX_BYTES} 字节", status=413)
+        if multipart:
+            # 边接收边解析，文件内容逐块写入临时文件，超过上限时立即返回 413
+            upload = await aspool_multipart(request.stream(), content_type)
+            file = upload.file
+            filename = filename or upload.filename
+            content_type = upload.content_type
+            doc_title = doc_title or upload.field("doc_title")
+            try:
+                detect_format(filename, content_type)
+            except IngestError:
+                file.close()
+                raise
+        else:
+            # 先识别类型，不支持的格式不必读取请求体
+            detect_format(filename, content_type)
+            file = await aspool_chunks(request.stream())
+    except IngestError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status)
+
+    async def generate():
+        events = upload_events(
+            file, filename, content_type, doc_title, trace, verdict_only
+        )
+        try:
+            async for event in atrack_stream("check_upload", events):
+                yield {"data": json.dumps(event, ensure_ascii=False)}
+        except IngestError as e:
+            yield {"data": json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False)}
+        finally:
+            file.close()
+
+    return EventSourceResponse(generate(), headers={"X-Accel-Buffering": "no"})
+
+
+class JobRequest(BaseModel):
+    doc_title: str = ""
+    doc_content: str
+    # 幂等键，也可通过 Idempotency-Key 请求头传入；重复提交返回同一任务
+    idempotency_key: str | None = None
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(body: JobRequest, request: Request):
+    """提交检测任务，立即返回任务编号；已存在的幂等键返回原任务（200）"""
+    key = body.idempotency_key or request.headers.get("idempotency-key")
+    item = parse_item({"doc_title": body.doc_title, "doc_content": body.doc_content})
+    try:
+        job, created = await asyncio.to_thread(job_queue.submit, item, key)
+    except IdempotencyConflict as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    return JSONResponse(job_status(job), status_code=202 if created else 200)
+
+
+@app.get("/jobs")
+async def jobs_stats():
+    """各状态的任务数"""
+    return await asyncio.to_thread(job_queue.stats)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        return JSONResponse({"error": "任务不存在"}, status_code=404)
+    return job_status(job)
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """任务完成时返回检测结果；未完成返回 202 与当前状态，最终失败返回 500 与错误信息"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        return JSONResponse({"error": "任务不存在"}, status_code=404)
+    if job["status"] == "done":
+        return job["result"]
+    if job["status"] == "failed":
+        return JSONResponse(job_status(job), status_code=500)
+    return JSONResponse(job_status(job), status_code=202)
+
+
+@app.get("/usage")
+async def usage():
+    """按节点和模型累计的 LLM 用量"""
+    return usage_stats.snapshot()
+
+
+@app.get("/prompts")
+async def prompts():
+    """提示词版本与各提示词静态前缀的 token 数"""
+    return prompt_stats()
+
+
+@app.post("/batch")
+async def batch(request: Request, concurrency: int | None = None):
+    """
+    批量检测：请求体为 JSON 数组，或 Content-Type 为 application/x-ndjson 的逐行文档流；
+    按完成顺序逐行返回结果（NDJSON），单个文档出错只影响该行
+    """
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items = aiter_ndjson(request.stream())
+    else:
+        try:
+            items = await request.json()
+        except json.JSONDecodeError:
+            items = None
+        if not isinstance(items, list):
+            return JSONResponse(
+                {"error": "请求体必须是 JSON 数组或 NDJSON"}, status_code=400
+            )
+
+    async def generate():
+        async for result in atrack_stream("batch", arun_batch(items, concurrency)):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
     import uvicorn
 
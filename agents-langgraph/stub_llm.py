@@ -0,0 +1,215 @@
+"""
+本地 OpenAI 兼容的模拟模型服务，用于压测和延迟测试，不产生任何调用费用
+
+python stub_llm.py --port 8001 --ttft 0.5 --tps 40 --error-rate 0.01 --rate-limit-rate 0.05
+LLM_BASE_URL=http://localhost:8001/v1 uvicorn serve:app --port 5001
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 模拟参数，可通过环境变量或命令行参数设置
+config = {
+    "ttft": float(os.getenv("STUB_TTFT", "0.3")),  # 首 token 延迟（秒）
+    "tps": float(os.getenv("STUB_TPS", "50")),  # 每秒输出 token 数
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),  # 500 错误比例
+    "rate_limit_rate": float(os.getenv("STUB_RATE_LIMIT_RATE", "0")),  # 429 比例
+    "sensitive_rate": float(os.getenv("STUB_SENSITIVE_RATE", "0.5")),  # 判定涉密比例
+}
+
+app = FastAPI(title="Stub LLM")
+
+
+def is_sensitive(prompt):
+    # 按提示词哈希确定结论，同一文档多次请求结果一致
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return digest[0] / 256 < config["sensitive_rate"]
+
+
+def canned_response(prompt):
+    """按提示词识别调用方节点，返回符合该节点输出格式的 JSON"""
+    sensitive = is_sensitive(prompt)
+    confidence = 92 if sensitive else 88
+    if "涉密文件决策评审专家" in prompt:
+        # nodes.decision_review_node
+        body = {
+            "is_sensitive": sensitive,
+            "evidence": "模拟评审：综合正向与反向分析结果给出结论。",
+            "confidence": confidence,
+        }
+    elif "信息安全决策模块" in prompt:
+        # agent_decision / agent_decision_stream
+        body = {
+            "result": sensitive,
+            "result_confidence": confidence,
+            "result_detail": "1. 关键词匹配分析：模拟报告\n2. 语义推断分析：模拟报告\n3. 非涉密证明分析：模拟报告\n4. 最终裁决："
+            + ("涉密" if sensitive else "非涉密"),
+        }
+    elif "文件解密与公开审核专员" in prompt:
+        # 反向非涉密分析：nodes 版本输出 公开/非公开，agents 版本输出布尔值
+        if "必须是布尔值" in prompt:
+            result = not sensitive
+        else:
+            result = "非公开" if sensitive else "公开"
+        body = {
+            "result": result,
+            "confidence": confidence,
+            "evidence": "模拟证据：未发现/发现风险点。",
+        }
+    elif "保密分析专家" in prompt:
+        # 正向涉密分析：nodes 版本输出 涉密/非涉密，agents 版本输出布尔值
+        if "必须是布尔值" in prompt:
+            result = sensitive
+        else:
+            result = "涉密" if sensitive else "非涉密"
+        body = {
+            "result": result,
+            "confidence": confidence,
+            "evidence": "模拟证据：文本中的隐晦指代。",
+        }
+    elif "文本分析专家" in prompt:
+        # agent_keyword 关键词关联判断
+        body = {
+            "associated": sensitive,
+            "confidence": confidence,
+            "evidence": "模拟关键词关联分析。",
+        }
+    else:
+        body = {"result": sensitive, "confidence": confidence, "evidence": "模拟响应"}
+    return json.dumps(body, ensure_ascii=False)
+
+
+def split_tokens(text, size=2):
+    # 以固定字符数近似 token
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def usage(prompt, completion_tokens):
+    prompt_tokens = max(1, len(prompt) // 2)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def injected_error():
+    roll = random.random()
+    if roll < config["rate_limit_rate"]:
+        return JSONResponse(
+            {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+    if roll < config["rate_limit_rate"] + config["error_rate"]:
+        return JSONResponse(
+            {"error": {"message": "Injected server error", "type": "server_error"}},
+            status_code=500,
+        )
+    return None
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = injected_error()
+    if error is not None:
+        return error
+
+    prompt = "\n".join(
+        str(message.get("content", "")) for message in body.get("messages", [])
+    )
+    model = body.get("model", "stub")
+    tokens = split_tokens(canned_response(prompt))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    interval = 1 / config["tps"] if config["tps"] > 0 else 0
+
+    if not body.get("stream"):
+        await asyncio.sleep(config["ttft"] + interval * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage(prompt, len(tokens)),
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+    def chunk(delta, finish_reason=None):
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def generate():
+        await asyncio.sleep(config["ttft"])
+        yield chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            yield chunk({"content": token})
+            await asyncio.sleep(interval)
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage(prompt, len(tokens)),
+            }
+            yield f"data: {json.dumps(data)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的模拟模型服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=config["ttft"])
+    parser.add_argument("--tps", type=float, default=config["tps"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument(
+        "--rate-limit-rate", type=float, default=config["rate_limit_rate"]
+    )
+    parser.add_argument("--sensitive-rate", type=float, default=config["sensitive_rate"])
+    args = parser.parse_args()
+    config.update(
+        {
+            "ttft": args.ttft,
+            "tps": args.tps,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "sensitive_rate": args.sensitive_rate,
+        }
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("prometheus_client")
+
+import agents
+import nodes
+from agents import adecision_events, agent_decision_stream, decision_events
+
+OUTPUT = '{"result": true, "result_confidence": 88, "result_detail": "含有密级标志，判定为涉密"}'
+TOKENS = [OUTPUT[i : i + 5] for i in range(0, len(OUTPUT), 5)]
+
+
+class FakeChain:
+    def __init__(self):
+        self.closed = False
+        self.sent = 0
+
+    def stream(self, state, config=None):
+        try:
+            for token in TOKENS:
+                self.sent += 1
+                yield SimpleNamespace(content=token)
+        finally:
+            self.closed = True
+
+    async def astream(self, state, config=None):
+        try:
+            for token in TOKENS:
+                self.sent += 1
+                yield SimpleNamespace(content=token)
+        finally:
+            self.closed = True
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    fake = FakeChain()
+    monkeypatch.setattr(agents, "_decision_chain", lambda: fake)
+    return fake
+
+
+STATE = {"agent_keyword_result": False, "agent_keyword_confidence": 0}
+
+
+def test_events_in_order(chain):
+    events = list(decision_events(STATE))
+    kinds = [kind for kind, _ in events]
+    assert kinds.count("verdict") == 1 and kinds[-1] == "final"
+    # 裁决在 result_detail 生成前发出
+    assert kinds.index("verdict") < len(TOKENS)
+    assert "".join(data for kind, data in events if kind == "token") == OUTPUT
+    assert events[-1][1]["result_detail"] == "含有密级标志，判定为涉密"
+    assert chain.closed
+
+
+def test_verdict_only_stops_and_keeps_partial_detail(chain):
+    final = dict(decision_events(STATE, verdict_only=True))["final"]
+    assert final["result"] is True and final["result_confidence"] == 88
+    assert final["result_detail_truncated"]
+    assert chain.sent < len(TOKENS) and chain.closed
+
+
+def test_async_events_match_sync(chain):
+    async def collect():
+        return [event async for event in adecision_events(STATE)]
+
+    assert asyncio.run(collect()) == list(decision_events(STATE))
+
+
+def test_callbacks(chain):
+    tokens, verdicts = [], []
+    result = agent_decision_stream(STATE, tokens.append, verdicts.append)
+    assert "".join(tokens) == OUTPUT
+    assert verdicts == [{"result": True, "result_confidence": 88}]
+    assert result["result_confidence"] == 88
+
+
+def test_nodes_stream_shares_decision_events(chain):
+    tokens = []
+    result = nodes.agent_decision_stream(STATE, tokens.append)
+    assert "".join(tokens) == OUTPUT
+    assert result["result_detail"] == "含有密级标志，判定为涉密"
+    assert chain.closed
+
+
+def test_keyword_fast_path_skips_model(chain):
+    state = {"agent_keyword_result": True, "agent_keyword_confidence": 95}
+    events = list(decision_events(state))
+    assert events[-1][1]["result"] is True
+    assert chain.sent == 0
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("prometheus_client")
+
+import agents
+import check
+import nodes
+from ingest import spool_chunks
+from utils.lexicon import LexiconRegistry
+
+
+@pytest.fixture
+def lexicons(tmp_path, monkeypatch):
+    files = {}
+    for name, lexicon in {
+        "keywords": {"密级标志": ["绝密"]},
+        "short_sentence": {"涉密短语": ["严禁对外传播"]},
+    }.items():
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(lexicon, ensure_ascii=False), encoding="utf-8")
+        files[name] = str(path)
+    monkeypatch.setattr(nodes, "registry", LexiconRegistry(files, interval=0))
+    monkeypatch.setattr(check, "verdict_cache", None)
+
+    # 硬条件命中时不应调用 LLM
+    def no_llm(*args, **kwargs):
+        raise AssertionError("硬条件命中后不应调用 LLM")
+
+    monkeypatch.setattr(agents, "get_model", no_llm)
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def upload(text):
+    spool = spool_chunks([text.encode("utf-8")])
+    return asyncio.run(collect(check.upload_events(spool, "doc.txt")))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "本通知严禁·对外传播，请妥善保管",  # 规范化后与短语完全一致
+        "本通知严禁对x外传播，请妥善保管",  # 插入一个字符，近似匹配
+    ],
+)
+def test_upload_runs_full_hard_condition_check(lexicons, text):
+    events = upload(text)
+    stages = [event for event in events if event.get("node") == "hard_condition_node"]
+    assert stages and stages[0]["data"]["is_sensitive"]
+    assert "严禁对外传播" in stages[0]["data"]["evidence"]
+
+    final = events[-1]
+    assert final["type"] == "final"
+    assert final["data"]["result"] is True
+    assert final["data"]["current_node"] == "hard_condition_node"
+
+
+def test_analysis_stages_share_nodes(monkeypatch):
+    def semantics(state):
+        return {"agent_semantics_result": True}
+
+    def proof(state):
+        return {"agent_non_secret_proof_result": False}
+
+    async def asemantics(state):
+        return semantics(state)
+
+    async def aproof(state):
+        return proof(state)
+
+    monkeypatch.setattr(
+        check,
+        "ANALYSIS_NODES",
+        (
+            ("agent_semantics", semantics, asemantics),
+            ("agent_non_secret_proof", proof, aproof),
+        ),
+    )
+    sync_state, async_state = check.initial_state("t", "c"), check.initial_state("t", "c")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        sync_events = list(check.analysis_stage(sync_state, executor))
+    async_events = asyncio.run(collect(check.aanalysis_stage(async_state)))
+
+    key = lambda event: event["node"]
+    assert sorted(sync_events, key=key) == sorted(async_events, key=key)
+    assert sync_state == async_state
+    assert sync_state["agent_semantics_result"] is True
@@ -0,0 +1,146 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("prometheus_client")
+
+import common_model
+from common_model import hedged_invoke_json
+
+
+class FakeModel:
+    """按脚本逐个返回 token 的流式模型；delay 为首个 token 前的等待时间"""
+
+    def __init__(self, content, delay=0.0, error=None, model_name="fake"):
+        self.content = content
+        self.delay = delay
+        self.error = error
+        self.model_name = model_name
+        self.openai_api_base = "https://primary.example/v1"
+        self.openai_api_key = None
+        self.temperature = 0
+        self.calls = 0
+
+    def stream(self, prompt_value):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        for ch in self.content:
+            yield SimpleNamespace(content=ch)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(str(status_code))
+        self.status_code = status_code
+
+
+@pytest.fixture
+def hedge(monkeypatch):
+    """hedge.model 为对冲请求使用的模型，hedge.configs 记录对冲模型的配置"""
+    state = SimpleNamespace(model=FakeModel('{"result": "hedge"}'), configs=[])
+
+    def get_model(*args):
+        state.configs.append(args)
+        return state.model
+
+    monkeypatch.setattr(common_model, "get_model", get_model)
+    monkeypatch.setattr(common_model, "HEDGE_DELAY", 0.05)
+    monkeypatch.setattr(common_model, "_latency", {})
+    monkeypatch.setattr(common_model, "_hedge_slots", threading.BoundedSemaphore(4))
+    return state
+
+
+def test_fast_primary_is_not_hedged(hedge):
+    primary = FakeModel('{"result": "primary"}')
+    assert hedged_invoke_json("p", primary) == {"result": "primary"}
+    assert hedge.model.calls == 0
+
+
+def test_slow_primary_is_hedged(hedge):
+    primary = FakeModel('{"result": "primary"}', delay=0.5)
+    assert hedged_invoke_json("p", primary) == {"result": "hedge"}
+    # 未配置备用端点时沿用原请求的模型和端点
+    assert hedge.configs == [("fake", "https://primary.example/v1", None, 0)]
+
+
+def test_saturated_primary_pool_runs_in_caller_thread(hedge, monkeypatch):
+    # 原请求在线程池中排队超过等待时间时撤回，在调用方线程直接请求，不发对冲
+    pool = common_model.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(common_model, "_primary_pool", pool)
+    blocker = pool.submit(time.sleep, 0.3)
+    primary = FakeModel('{"result": "primary"}', delay=0.01)
+    start = time.perf_counter()
+    assert hedged_invoke_json("p", primary) == {"result": "primary"}
+    assert time.perf_counter() - start < 0.2
+    assert hedge.model.calls == 0
+    blocker.result()
+
+
+def test_hedges_do_not_wait_behind_primaries(hedge, monkeypatch):
+    pool = common_model.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(common_model, "_primary_pool", pool)
+    primary = FakeModel('{"result": "primary"}', delay=0.5)
+    start = time.perf_counter()
+    assert hedged_invoke_json("p", primary) == {"result": "hedge"}
+    assert time.perf_counter() - start < 0.3
+
+
+@pytest.mark.parametrize("status", [429, 502])
+def test_retryable_failure_falls_through_to_hedge(hedge, status):
+    primary = FakeModel("", error=StatusError(status))
+    start = time.perf_counter()
+    assert hedged_invoke_json("p", primary) == {"result": "hedge"}
+    assert time.perf_counter() - start < 0.05
+
+
+@pytest.mark.parametrize("status", [400, 401])
+def test_client_error_is_not_hedged(hedge, status):
+    primary = FakeModel("", error=StatusError(status))
+    with pytest.raises(StatusError):
+        hedged_invoke_json("p", primary)
+    assert hedge.model.calls == 0
+
+
+def test_invalid_output_is_not_hedged(hedge):
+    with pytest.raises(KeyError):
+        hedged_invoke_json("p", FakeModel('{"other": 1}'), ("result",))
+    assert hedge.model.calls == 0
+
+
+def test_missing_required_keys_is_not_a_valid_response(hedge):
+    # 对冲发出后先返回的无效结果不算胜出，继续等待另一个请求
+    primary = FakeModel('{"other": 1}', delay=0.1)
+    hedge.model = FakeModel('{"result": "hedge", "confidence": 90}', delay=0.15)
+    assert hedged_invoke_json("p", primary, ("result", "confidence")) == {
+        "result": "hedge",
+        "confidence": 90,
+    }
+
+
+def test_both_invalid_raises(hedge):
+    hedge.model = FakeModel('{"result": ')
+    with pytest.raises(Exception):
+        hedged_invoke_json("p", FakeModel('{"result": ', delay=0.1))
+
+
+def test_hedges_in_flight_are_capped(hedge, monkeypatch):
+    monkeypatch.setattr(common_model, "_hedge_slots", threading.BoundedSemaphore(1))
+    hedge.model = FakeModel('{"result": "hedge"}', delay=0.3)
+    results = []
+
+    def call():
+        results.append(hedged_invoke_json("p", FakeModel('{"result": "primary"}', delay=0.15)))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 只有一个调用发出了对冲，另一个等待原请求返回
+    assert hedge.model.calls == 1
+    assert results == [{"result": "primary"}, {"result": "primary"}]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import ingest
+from ingest import IngestError, aspool_multipart, extract_text, spool_chunks
+
+BOUNDARY = "----boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def form_body(content, filename="doc.txt", title="通知"):
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="doc_title"\r\n\r\n'
+        f"{title}\r\n"
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{BOUNDARY}--\r\n".encode("utf-8")
+
+
+async def chunked(body, size=7, consumed=None):
+    for i in range(0, len(body), size):
+        if consumed is not None:
+            consumed.append(i + size)
+        yield body[i : i + size]
+
+
+def test_spool_chunks_rejects_oversized():
+    with pytest.raises(IngestError) as e:
+        spool_chunks([b"a" * 10, b"b" * 10], max_bytes=15)
+    assert e.value.status == 413
+
+
+def test_extract_plain_text():
+    spool = spool_chunks(["第一段\n第二段".encode("utf-8")])
+    text, stats = extract_text(spool, "doc.txt")
+    assert text == "第一段\n第二段"
+    assert stats["format"] == "text" and not stats["truncated"]
+
+
+needs_multipart = pytest.mark.skipif(
+    ingest.MultipartParser is None, reason="未安装 python-multipart"
+)
+
+
+@needs_multipart
+def test_multipart_is_parsed_while_streaming():
+    content = "本文件为内部资料".encode("utf-8")
+    upload = asyncio.run(aspool_multipart(chunked(form_body(content)), CONTENT_TYPE))
+    assert upload.file.read() == content
+    assert (upload.filename, upload.content_type) == ("doc.txt", "text/plain")
+    assert upload.field("doc_title") == "通知"
+
+
+@needs_multipart
+def test_multipart_oversized_file_is_rejected_while_arriving():
+    body = form_body(b"x" * 1000)
+    consumed = []
+    with pytest.raises(IngestError) as e:
+        asyncio.run(
+            aspool_multipart(chunked(body, 50, consumed), CONTENT_TYPE, max_bytes=100)
+        )
+    assert e.value.status == 413
+    assert consumed[-1] < len(body)
+
+
+@needs_multipart
+def test_multipart_without_file_field():
+    body = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="doc_title"\r\n\r\n'
+        f"通知\r\n--{BOUNDARY}--\r\n"
+    ).encode("utf-8")
+    with pytest.raises(IngestError) as e:
+        asyncio.run(aspool_multipart(chunked(body), CONTENT_TYPE))
+    assert e.value.status == 400
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+import jobs
+from jobs import IdempotencyConflict, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BACKOFF", 0)
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_claim_complete(queue):
+    job, created = queue.submit({"doc_content": "正文"}, max_attempts=2)
+    assert created and job["status"] == "queued"
+    claimed, token = queue.claim()
+    assert claimed["id"] == job["id"] and token == 1
+    assert queue.claim() is None
+    assert queue.complete(job["id"], token, {"is_sensitive": False})
+    done = queue.get(job["id"])
+    assert done["status"] == "done" and done["result"] == {"is_sensitive": False}
+
+
+def test_idempotency_key(queue):
+    job, _ = queue.submit({"doc_content": "正文"}, idempotency_key="k")
+    again, created = queue.submit({"doc_content": "正文"}, idempotency_key="k")
+    assert not created and again["id"] == job["id"]
+    with pytest.raises(IdempotencyConflict):
+        queue.submit({"doc_content": "其他"}, idempotency_key="k")
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    job, _ = queue.submit({"doc_content": "正文"}, max_attempts=2)
+    _, token = queue.claim()
+    assert queue.fail(job["id"], token, "超时")
+    assert queue.get(job["id"])["status"] == "queued"
+    _, token = queue.claim()
+    assert token == 2
+    assert queue.fail(job["id"], token, "超时")
+    assert queue.get(job["id"])["status"] == "failed"
+    assert queue.stats()["failed"] == 1
+
+
+def test_reclaim_after_lease_expiry(queue):
+    job, _ = queue.submit({"doc_content": "正文"}, max_attempts=3)
+    _, first = queue.claim(lease=0)
+    time.sleep(0.01)
+    reclaimed, second = queue.claim()
+    assert reclaimed["id"] == job["id"] and second == first + 1
+
+
+def test_stale_completion_is_rejected(queue):
+    job, _ = queue.submit({"doc_content": "正文"}, max_attempts=3)
+    _, stale = queue.claim(lease=0)
+    time.sleep(0.01)
+    _, current = queue.claim()
+    # 原 worker 租约过期后才返回，结果与失败都不能覆盖新的执行
+    assert not queue.complete(job["id"], stale, {"is_sensitive": True})
+    assert not queue.fail(job["id"], stale, "超时")
+    assert not queue.heartbeat(job["id"], stale)
+    assert queue.get(job["id"])["status"] == "running"
+    assert queue.complete(job["id"], current, {"is_sensitive": False})
+    assert queue.get(job["id"])["result"] == {"is_sensitive": False}
+
+
+def test_expired_lease_on_last_attempt_fails(queue):
+    job, _ = queue.submit({"doc_content": "正文"}, max_attempts=1)
+    queue.claim(lease=0)
+    time.sleep(0.01)
+    assert queue.claim() is None
+    assert queue.get(job["id"])["status"] == "failed"
+
+
+def test_heartbeat_extends_lease(queue):
+    job, _ = queue.submit({"doc_content": "正文"})
+    _, token = queue.claim(lease=0.05)
+    with jobs.lease_heartbeat(queue, job["id"], token, interval=0.01):
+        time.sleep(0.15)
+        assert queue.claim() is None
+    assert queue.complete(job["id"], token, {})
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("prometheus_client")
+
+import nodes
+from nodes import analyze_long_document, is_secret
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    """10 个分块、并发 2；calls 记录发出的分块正文，peak 为同时在途的最大调用数"""
+    state = {"calls": [], "running": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def invoke_json(prompt, chunk_state, llm, required):
+        content = chunk_state["doc_content"]
+        with lock:
+            state["calls"].append(content)
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        try:
+            if content.startswith("甲"):
+                return {"result": "涉密", "confidence": 95, "evidence": "命中"}
+            time.sleep(0.05)
+            return {"result": "非涉密", "confidence": 80, "evidence": "无"}
+        finally:
+            with lock:
+                state["running"] -= 1
+
+    monkeypatch.setattr(nodes, "invoke_json", invoke_json)
+    monkeypatch.setattr(nodes, "CHUNK_SIZE", 4)
+    monkeypatch.setattr(nodes, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(nodes, "CHUNK_CONCURRENCY", 2)
+    return state
+
+
+def test_chunks_are_submitted_within_the_window(chunked):
+    text = "乙乙乙乙" * 10
+    result = analyze_long_document(None, {"doc_content": text}, None, is_secret)
+    assert len(chunked["calls"]) == 10
+    assert chunked["peak"] <= 2
+    assert result["result"] == "非涉密"
+
+
+def test_early_exit_leaves_no_work_beyond_the_window(chunked):
+    text = "甲甲甲甲" + "乙乙乙乙" * 9
+    result = analyze_long_document(None, {"doc_content": text}, None, is_secret)
+    assert result["result"] == "涉密" and result["confidence"] == 95
+    # 第一个分块命中时只发出了并发窗口内的分块，等在途调用结束后也没有更多调用
+    time.sleep(0.1)
+    assert len(chunked["calls"]) <= 2
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from prescreen import cross_validate, skip_report
+
+
+def test_false_skip_rate_counts_skipped_sensitive_documents():
+    report = skip_report([0.99, 0.99, 0.2, 0.99], [1, 0, 1, 0], threshold=0.95)
+    assert report["skipped"] == 3
+    assert report["missed_sensitive"] == 1
+    assert report["false_skip_rate"] == 0.5
+
+
+def test_cross_validate_scores_every_document_out_of_fold():
+    texts = ["绝密作战计划第%d号" % i for i in range(6)] + ["公开招聘公告第%d期" % i for i in range(6)]
+    labels = [1] * 6 + [0] * 6
+    report = cross_validate(texts, labels, threshold=0.5, folds=3, epochs=50)
+    assert report["documents"] == 12 and report["folds"] == 3
+    assert report["false_skip_rate"] == 0
+    assert report["skipped"] == 6
@@ -0,0 +1,179 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 采样率（0-1），默认关闭；被采样的请求以 JSONL 追加写入 TRACE_PATH
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# 默认写在本目录下，与启动时的工作目录无关（与 cache/ 等其他数据文件一致）
+TRACE_PATH = os.getenv("TRACE_PATH", os.path.join(current_dir, "traces/traces.jsonl"))
+# 事件属性中字符串的最大长度，避免把完整的模型输出写进追踪
+TRACE_MAX_ATTR_CHARS = int(os.getenv("TRACE_MAX_ATTR_CHARS", "500"))
+
+# 当前所在的 span，未开启追踪时为 None，此时所有埋点直接返回
+current_span = contextvars.ContextVar("current_span", default=None)
+
+_write_lock = threading.Lock()
+
+
+def clip(value):
+    if isinstance(value, str) and len(value) > TRACE_MAX_ATTR_CHARS:
+        return value[:TRACE_MAX_ATTR_CHARS] + "..."
+    return value
+
+
+class Span:
+    __slots__ = ("trace", "name", "kind", "attrs", "start", "end", "events", "children")
+
+    def __init__(self, trace, name, kind, attrs):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.attrs = {key: clip(value) for key, value in attrs.items()}
+        self.start = time.perf_counter()
+        self.end = None
+        self.events = []
+        self.children = []
+
+    def child(self, name, kind, attrs):
+        span = Span(self.trace, name, kind, attrs)
+        # 并行节点在不同线程中向同一父 span 追加子 span
+        with self.trace.lock:
+            self.children.append(span)
+        return span
+
+    def finish(self, **attrs):
+        self.attrs.update({key: clip(value) for key, value in attrs.items()})
+        self.end = time.perf_counter()
+
+    def to_dict(self, origin):
+        end = self.end if self.end is not None else time.perf_counter()
+        data = {
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.events:
+            data["events"] = self.events
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class Trace:
+    """单个请求的 span 树"""
+
+    def __init__(self, name, sampled, attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.sampled = sampled
+        self.lock = threading.Lock()
+        self.timestamp = time.time()
+        self.root = Span(self, name, "request", attrs)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "timestamp": self.timestamp,
+            **self.root.to_dict(self.root.start),
+        }
+
+
+def start_trace(name, attach=False, **attrs):
+    """
+    为当前请求开启追踪：按 TRACE_SAMPLE_RATE 采样，或调用方要求在结果中附带追踪时开启；
+    未开启时返回 None，后续埋点均为空操作
+    """
+    sampled = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+    if not sampled and not attach:
+        current_span.set(None)
+        return None
+    trace = Trace(name, sampled, attrs)
+    current_span.set(trace.root)
+    return trace
+
+
+def finish_trace(trace):
+    """结束追踪，被采样时写入 JSONL，返回可附加到响应中的 span 树"""
+    if trace is None:
+        return None
+    trace.root.finish()
+    data = trace.to_dict()
+    if trace.sampled:
+        line = json.dumps(data, ensure_ascii=False, default=str)
+        with _write_lock:
+            directory = os.path.dirname(TRACE_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(TRACE_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    return data
+
+
+@contextmanager
+def traced(name, trace_name=None, attach=False, **attrs):
+    """开启追踪并在退出时结束，用于非流式的单次调用（如批量检测中的单个文档）"""
+    previous = current_span.get()
+    trace = start_trace(trace_name or name, attach, **attrs)
+    try:
+        yield trace
+    finally:
+        finish_trace(trace)
+        current_span.set(previous)
+
+
+def open_span(name, kind="node", **attrs):
+    """在当前 span 下开启子 span，未开启追踪时返回 None；需配合 close_span 使用"""
+    parent = current_span.get()
+    if parent is None:
+        return None
+    return parent.child(name, kind, attrs)
+
+
+def close_span(span, **attrs):
+    if span is not None:
+        span.finish(**attrs)
+
+
+@contextmanager
+def span(name, kind="node", **attrs):
+    """
+    记录一段耗时并作为当前 span 的子节点；
+    退出时恢复父 span 而不是 reset，流式生成器跨 yield 使用时也不会出错
+    """
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind, attrs)
+    current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.attrs["error"] = clip(f"{type(e).__name__}: {str(e)}")
+        raise
+    finally:
+        child.finish()
+        current_span.set(parent)
+
+
+def trace_event(name, **attrs):
+    """在当前 span 上记录一个事件（替代控制台输出），未开启追踪时为空操作"""
+    parent = current_span.get()
+    if parent is None:
+        return
+    event = {
+        "name": name,
+        "at_ms": round((time.perf_counter() - parent.trace.root.start) * 1000, 3),
+    }
+    event.update({key: clip(value) for key, value in attrs.items()})
+    with parent.trace.lock:
+        parent.events.append(event)
@@ -0,0 +1,195 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from metrics import record_llm_error
+from tracing import close_span, open_span
+
+# 当前请求的用量收集器，由 track_request() / start_request() 设置
+current_request = contextvars.ContextVar("current_request_usage", default=None)
+
+
+def empty_totals():
+    return {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "wall_time": 0.0,
+    }
+
+
+def add_call(totals, call):
+    totals["calls"] += 1
+    totals["prompt_tokens"] += call["prompt_tokens"]
+    totals["completion_tokens"] += call["completion_tokens"]
+    totals["cached_tokens"] += call["cached_tokens"]
+    totals["wall_time"] += call["wall_time"]
+
+
+class RequestUsage:
+    """单个请求内全部 LLM 调用的用量明细"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def add(self, call):
+        with self.lock:
+            self.calls.append(call)
+
+    def summary(self):
+        with self.lock:
+            calls = list(self.calls)
+        total = empty_totals()
+        by_node = {}
+        for call in calls:
+            add_call(total, call)
+            add_call(by_node.setdefault(call["node"], empty_totals()), call)
+        return {"total": total, "by_node": by_node}
+
+
+class UsageStats:
+    """进程级累计用量，按 (节点, 模型) 统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def add(self, call):
+        with self.lock:
+            key = (call["node"], call["model"])
+            add_call(self.counters.setdefault(key, empty_totals()), call)
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                {"node": node, "model": model, **dict(totals)}
+                for (node, model), totals in sorted(self.counters.items())
+            ]
+
+
+usage_stats = UsageStats()
+
+
+def read_usage(response):
+    """从 LLMResult 中读取 token 用量，优先使用 usage_metadata"""
+    prompt_tokens = completion_tokens = cached_tokens = 0
+    generations = response.generations[0] if response.generations else []
+    message = getattr(generations[0], "message", None) if generations else None
+    usage_metadata = getattr(message, "usage_metadata", None)
+    if usage_metadata:
+        prompt_tokens = usage_metadata.get("input_tokens", 0)
+        completion_tokens = usage_metadata.get("output_tokens", 0)
+        details = usage_metadata.get("input_token_details") or {}
+        cached_tokens = details.get("cache_read", 0)
+    else:
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens") or 0
+        completion_tokens = token_usage.get("completion_tokens") or 0
+        details = token_usage.get("prompt_tokens_details") or {}
+        cached_tokens = details.get("cached_tokens") or 0
+    return prompt_tokens, completion_tokens, cached_tokens
+
+
+class UsageCallback(BaseCallbackHandler):
+    """
+    记录每次 LLM 调用的 token 用量与耗时，按节点和模型打标签，
+    同时写入进程级累计和当前请求的收集器
+    """
+
+    # 同步执行回调，保证 contextvars 中的请求收集器可见
+    run_inline = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, kwargs.get("metadata") or {})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, kwargs.get("metadata") or {})
+
+    def _start(self, run_id, metadata):
+        node = metadata.get("langgraph_node") or metadata.get("node") or "unknown"
+        model = metadata.get("ls_model_name") or "unknown"
+        request_usage = current_request.get()
+        llm_span = open_span(model, kind="llm", node=node)
+        with self.lock:
+            self.runs[run_id] = (
+                node,
+                model,
+                time.perf_counter(),
+                request_usage,
+                llm_span,
+            )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self.lock:
+            started = self.runs.pop(run_id, None)
+        if started is None:
+            return
+        node, model, start, request_usage, llm_span = started
+        prompt_tokens, completion_tokens, cached_tokens = read_usage(response)
+        close_span(
+            llm_span,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+        )
+        call = {
+            "node": node,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "wall_time": time.perf_counter() - start,
+        }
+        usage_stats.add(call)
+        if request_usage is not None:
+            request_usage.add(call)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            started = self.runs.pop(run_id, None)
+        # 调用方主动关闭流（如仅需裁决时提前结束）不计为错误
+        cancelled = isinstance(error, (GeneratorExit, asyncio.CancelledError))
+        if started is not None:
+            if cancelled:
+                close_span(started[4], cancelled=True)
+            else:
+                close_span(started[4], error=f"{type(error).__name__}: {str(error)}")
+        if not cancelled:
+            record_llm_error(error)
+
+
+usage_callback = UsageCallback()
+
+
+def start_request():
+    """
+    为流式接口的生成器开始收集用量：生成器在同一上下文中逐步执行，
+    直接设置收集器即可，无需包裹整个生成器
+    """
+    request_usage = RequestUsage()
+    current_request.set(request_usage)
+    return request_usage
+
+
+@contextmanager
+def track_request():
+    """在当前上下文中收集本次请求的 LLM 用量"""
+    request_usage = RequestUsage()
+    token = current_request.set(request_usage)
+    try:
+        yield request_usage
+    finally:
+        current_request.reset(token)
+
+
+def node_config(node):
+    """为不在 langgraph 节点内的调用标注节点名称"""
+    return {"metadata": {"node": node}, "run_name": node}
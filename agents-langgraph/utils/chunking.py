@@ -0,0 +1,47 @@
+def split_windows(text, size, overlap):
+    """
+    按固定长度切分为相互重叠的窗口，避免跨窗口的短语被切断
+    返回 [(起始位置, 窗口文本)]
+    """
+    if size <= overlap:
+        raise ValueError("窗口长度必须大于重叠长度")
+    if len(text) <= size:
+        return [(0, text)]
+    step = size - overlap
+    windows = []
+    start = 0
+    while True:
+        windows.append((start, text[start : start + size]))
+        if start + size >= len(text):
+            break
+        start += step
+    return windows
+
+
+def chunk_confidence(result):
+    try:
+        return int(result.get("confidence", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def reduce_chunk_results(results, total, flagged):
+    """
+    合并分块分析结果 [(分块序号, {result, confidence, evidence})]，total 为分块总数：
+    任一分块存在风险即整体存在风险，结论取置信度最高的风险分块，置信度取风险分块中的最大值；
+    否则整体无风险，置信度取各分块中的最小值。证据按分块顺序拼接
+    """
+    results = sorted(results, key=lambda item: item[0])
+    risky = [(i, result) for i, result in results if flagged(result)]
+    selected = risky or results
+    if risky:
+        strongest = max(risky, key=lambda item: chunk_confidence(item[1]))[1]
+        label = strongest["result"]
+        confidence = max(chunk_confidence(result) for _, result in risky)
+    else:
+        label = results[0][1].get("result")
+        confidence = min(chunk_confidence(result) for _, result in results)
+    evidence = "；".join(
+        f"分块{i + 1}/{total}：{result.get('evidence', '')}" for i, result in selected
+    )
+    return {"result": label, "confidence": confidence, "evidence": evidence}
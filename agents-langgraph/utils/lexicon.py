@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import os
+import threading
+from utils.matcher import LexiconMatcher, load_lexicon
+from utils.normalize import content_normalizer, match_normalizer
+
+logger = logging.getLogger(__name__)
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 词库名称 -> 文件路径
+LEXICON_FILES = {
+    "keywords": os.path.join(base_dir, "static/keywords.json"),
+    "short_sentence": os.path.join(base_dir, "static/short_sentence.json"),
+}
+
+
+# 建立近似匹配索引的词库及其参数，可通过环境变量调整
+FUZZY_LEXICONS = {
+    "short_sentence": {
+        "max_errors": int(os.getenv("FUZZY_MAX_ERRORS", "1")),
+        "min_length": int(os.getenv("FUZZY_MIN_LENGTH", "4")),
+        "min_similarity": float(os.getenv("FUZZY_MIN_SIMILARITY", "0.75")),
+        # 设置 FUZZY_INSERT_ONLY=0 时同时容忍替换、删除字符
+        "insert_only": os.getenv("FUZZY_INSERT_ONLY", "1") != "0",
+    },
+}
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class LexiconSnapshot:
+    """
+    某一时刻编译好的全部词库，只读；version 由文件内容哈希得到
+    """
+
+    def __init__(self, files):
+        self.mtimes = {}
+        self.matchers = {}
+        digest = hashlib.sha256()
+        for name, path in sorted(files.items()):
+            self.mtimes[name] = _mtime(path)
+            lexicon = load_lexicon(path)
+            # 字面量词条与文本经过同一匹配规范化；正则词条在保留标点的内容规范化文本上扫描
+            self.matchers[name] = LexiconMatcher(
+                lexicon,
+                FUZZY_LEXICONS.get(name),
+                normalizer=match_normalizer,
+                regex_normalizer=content_normalizer,
+            )
+            digest.update(name.encode("utf-8"))
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        self.version = digest.hexdigest()[:12]
+
+    def __getitem__(self, name):
+        return self.matchers[name]
+
+
+def _report_reload_failure(error):
+    from metrics import record_lexicon_reload_failure
+
+    # 后台线程中没有请求级追踪，写入日志
+    logger.warning("词库重新加载失败，继续使用旧词库: %s: %s", type(error).__name__, error)
+    record_lexicon_reload_failure(error)
+
+
+class LexiconRegistry:
+    """
+    进程级词库注册表：导入时加载一次，后台线程轮询文件 mtime，
+    变化时在后台重新编译，再整体替换快照（引用赋值是原子的）
+    """
+
+    def __init__(self, files, interval=5.0):
+        self.files = files
+        self.interval = interval
+        self._snapshot = LexiconSnapshot(files)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def changed(self):
+        snapshot = self._snapshot
+        return any(
+            _mtime(path) != snapshot.mtimes.get(name)
+            for name, path in self.files.items()
+        )
+
+    def reload(self, force=False):
+        """文件有变化时重新编译并替换，返回当前快照"""
+        with self._lock:
+            try:
+                if force or self.changed():
+                    self._snapshot = LexiconSnapshot(self.files)
+            except Exception as e:
+                # 词库写到一半、格式错误、编码错误或文件无法读取时保留旧快照，下一轮再试
+                _report_reload_failure(e)
+        return self._snapshot
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # 监视线程退出后词库将不再更新，任何异常都不能让它退出
+                _report_reload_failure(e)
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._watch, name="lexicon-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+registry = LexiconRegistry(
+    LEXICON_FILES, interval=float(os.getenv("LEXICON_RELOAD_INTERVAL", "5"))
+)
+registry.start()
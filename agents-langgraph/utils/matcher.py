@@ -0,0 +1,371 @@
+import json
+import os
+import re
+from collections import deque, namedtuple
+
+# 单条命中：类别、词条、在文本中的起止位置
+Hit = namedtuple("Hit", ["category", "pattern", "start", "end"])
+# 近似命中：另含编辑距离与相似度（1 - 编辑距离 / 词条长度）
+FuzzyHit = namedtuple(
+    "FuzzyHit", ["category", "pattern", "start", "end", "distance", "similarity"]
+)
+
+# 出现这些字符的词条按正则处理，其余按字面量处理
+REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def is_regex(pattern):
+    return any(ch in REGEX_META for ch in pattern)
+
+
+# 不能放进合并大正则的写法：全局内联标志（合并后不再位于开头）、反向引用（合并后组号改变）
+UNCOMBINABLE = re.compile(r"^\(\?[aiLmsux]+\)|\\[1-9]|\(\?P=")
+
+
+def combinable(pattern):
+    return UNCOMBINABLE.search(pattern) is None
+
+
+def compile_regex_entries(patterns):
+    """
+    把正则词条合并为一个预编译的大正则，返回 (合并后的正则或 None, [(词条下标, 单独编译的正则)])
+    无法合并的词条单独编译、单独扫描；合并编译失败时全部退化为单独扫描
+    """
+    alternatives = []
+    separate = []
+    for index, pattern in enumerate(patterns):
+        if combinable(pattern):
+            alternatives.append((index, pattern))
+        else:
+            separate.append((index, re.compile(pattern)))
+    if not alternatives:
+        return None, separate
+    try:
+        # 零宽前瞻使每个位置都尝试一次，重叠命中不会被吞掉
+        combined = re.compile(
+            "(?=(?:"
+            + "|".join(f"(?P<p{index}>{pattern})" for index, pattern in alternatives)
+            + "))"
+        )
+    except re.error:
+        separate.extend((index, re.compile(pattern)) for index, pattern in alternatives)
+        separate.sort(key=lambda item: item[0])
+        return None, separate
+    return combined, separate
+
+
+class AhoCorasick:
+    """
+    字面量多模式匹配自动机，一次扫描文本返回所有（含重叠）命中
+    """
+
+    def __init__(self, patterns):
+        # patterns: [(pattern, payload)]
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern, payload in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append((len(pattern), payload))
+        self._build_fail()
+
+    def _build_fail(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                # 合并失败链上的输出，扫描时无需再沿失败链回溯
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                yield i - length + 1, i + 1, payload
+
+
+def split_pieces(pattern, count):
+    """把词条切成 count 段，返回 [(片段, 片段在词条中的偏移)]"""
+    size, extra = divmod(len(pattern), count)
+    pieces = []
+    offset = 0
+    for i in range(count):
+        length = size + (1 if i < extra else 0)
+        pieces.append((pattern[offset : offset + length], offset))
+        offset += length
+    return pieces
+
+
+def approximate_matches(pattern, text, max_errors, insert_only=False):
+    """
+    半全局编辑距离（Sellers 算法）：找出 text 中与 pattern 编辑距离不超过 max_errors 的子串，
+    相互重叠的候选只保留距离最小（相同时取较长）的一个，返回 [(距离, 起点, 终点)]
+    insert_only: 只允许在词条字符之间插入多余字符，不允许替换或删除词条中的字符
+    """
+    m = len(pattern)
+    # 不可达的代价
+    blocked = m + max_errors + 1
+    # 每列保存 (代价, 匹配起点)，第 0 行代价为 0，即匹配可以从任意位置开始；
+    # 其余行在文本开头之前只能靠删除词条字符到达
+    previous = [(0, 0)] + [
+        (blocked if insert_only else i, 0) for i in range(1, m + 1)
+    ]
+    matches = []
+    for j, ch in enumerate(text, 1):
+        current = [(0, j)]
+        for i in range(1, m + 1):
+            cost, start = previous[i - 1]
+            if pattern[i - 1] != ch:
+                # 替换
+                cost = blocked if insert_only else cost + 1
+            candidate = (cost, start)
+            if not insert_only:
+                # 删除词条中的字符
+                up = current[i - 1]
+                if up[0] + 1 < candidate[0]:
+                    candidate = (up[0] + 1, up[1])
+            # 文本中插入的字符
+            left = previous[i]
+            if left[0] + 1 < candidate[0]:
+                candidate = (left[0] + 1, left[1])
+            current.append(candidate)
+        cost, start = current[m]
+        if cost <= max_errors:
+            if matches and start < matches[-1][2]:
+                # 与上一个候选重叠
+                last = matches[-1]
+                if (cost, start - j) <= (last[0], last[1] - last[2]):
+                    matches[-1] = (cost, start, j)
+            else:
+                matches.append((cost, start, j))
+        previous = current
+    return matches
+
+
+class FuzzyMatcher:
+    """
+    近似匹配索引，默认只容忍在词条字符之间插入的填充字符（如“严禁w外传”），
+    insert_only=False 时同时容忍删除、替换字符（“严禁外出”之类的近义写法也会命中，误报较多）：
+    按鸽巢原理把每个词条切成 max_errors + 1 段，编辑距离不超过 max_errors 的出现
+    至少包含一段原样片段；一次 Aho-Corasick 扫描找出全部片段，
+    再只在片段附近的窗口内用编辑距离校验
+    """
+
+    def __init__(
+        self, entries, max_errors=1, min_length=4, min_similarity=0.75, insert_only=True
+    ):
+        # entries: [(类别, 词条)]，只索引字面量词条
+        self.max_errors = max_errors
+        self.insert_only = insert_only
+        self.min_similarity = min_similarity
+        self.entries = []
+        pieces = []
+        for category, pattern in entries:
+            if len(pattern) < min_length:
+                continue
+            errors = min(max_errors, len(pattern) - 1)
+            entry_id = len(self.entries)
+            self.entries.append((category, pattern, errors))
+            for piece, offset in split_pieces(pattern, errors + 1):
+                pieces.append((piece, (entry_id, offset)))
+        self.size = len(self.entries)
+        self.automaton = AhoCorasick(pieces)
+
+    def scan(self, text):
+        """返回按位置排序的近似命中，同一词条重叠的候选窗口只保留最好的一个"""
+        windows = {}
+        for start, _, (entry_id, offset) in self.automaton.iter(text):
+            _, pattern, errors = self.entries[entry_id]
+            lo = max(0, start - offset - errors)
+            hi = min(len(text), start - offset + len(pattern) + errors)
+            windows.setdefault(entry_id, []).append((lo, hi))
+
+        hits = []
+        for entry_id, spans in windows.items():
+            category, pattern, errors = self.entries[entry_id]
+            for lo, hi in merge_spans(spans):
+                for distance, start, end in approximate_matches(
+                    pattern, text[lo:hi], errors, self.insert_only
+                ):
+                    similarity = 1 - distance / len(pattern)
+                    if similarity >= self.min_similarity:
+                        hits.append(
+                            FuzzyHit(
+                                category,
+                                pattern,
+                                lo + start,
+                                lo + end,
+                                distance,
+                                similarity,
+                            )
+                        )
+        hits.sort(key=lambda hit: (hit.start, -hit.similarity))
+        return hits
+
+    def best(self, text):
+        """返回相似度最高的近似命中，没有命中时返回 None"""
+        hits = self.scan(text)
+        if not hits:
+            return None
+        return max(hits, key=lambda hit: (hit.similarity, -hit.start))
+
+
+def merge_spans(spans):
+    spans.sort()
+    merged = [list(spans[0])]
+    for lo, hi in spans[1:]:
+        if lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+class LexiconMatcher:
+    """
+    词库匹配引擎：字面量词条走 Aho-Corasick，正则词条合并为一个预编译的大正则
+    lexicon: {类别: [词条, ...]}，与 static/*.json 的格式一致
+    fuzzy: 传入 FuzzyMatcher 的参数（dict）时同时为字面量词条建立近似匹配索引
+    normalizer: 字面量词条与近似索引使用的规范化（utils.normalize.Normalizer），
+    词条与待扫描文本经过同一规范化；规范化后为空的词条被拒绝，记录在 rejected 中
+    regex_normalizer: 正则词条扫描前对文本的规范化。正则语法中的标点有特殊含义，
+    词条本身不做规范化，因此应使用保留标点的规范化，正则需按该规范化后的文本编写
+    """
+
+    def __init__(self, lexicon, fuzzy=None, normalizer=None, regex_normalizer=None):
+        self.normalizer = normalizer
+        self.regex_normalizer = regex_normalizer
+        literals = []
+        self.regex_entries = []
+        self.rejected = []
+        for category, patterns in lexicon.items():
+            for pattern in patterns:
+                if is_regex(pattern):
+                    try:
+                        re.compile(pattern)
+                    except re.error:
+                        # 非法正则退化为字面量，避免整个词库无法编译
+                        pass
+                    else:
+                        self.regex_entries.append((category, pattern))
+                        continue
+                key = normalizer(pattern) if normalizer is not None else pattern
+                if not key:
+                    self.rejected.append((category, pattern))
+                    continue
+                literals.append((key, (category, pattern)))
+        self.size = len(literals) + len(self.regex_entries)
+        self.automaton = AhoCorasick(literals)
+        self.fuzzy = None
+        if fuzzy is not None:
+            self.fuzzy = FuzzyMatcher(
+                [(category, key) for key, (category, _) in literals], **fuzzy
+            )
+        self.regex, self.separate = compile_regex_entries(
+            [pattern for _, pattern in self.regex_entries]
+        )
+
+    def scan(self, text):
+        """一次扫描，返回按位置排序的全部命中"""
+        hits = [
+            Hit(category, pattern, start, end)
+            for start, end, (category, pattern) in self.automaton.iter(text)
+        ]
+        for index, start, end in self._regex_matches(text):
+            category, pattern = self.regex_entries[index]
+            hits.append(Hit(category, pattern, start, end))
+        hits.sort(key=lambda hit: (hit.start, hit.end))
+        return hits
+
+    def first(self, text):
+        """返回文本中最靠前的命中，没有命中时返回 None"""
+        hits = self.scan(text)
+        return hits[0] if hits else None
+
+    def fuzzy_best(self, text):
+        """近似匹配中相似度最高的命中，未建立近似索引或没有命中时返回 None"""
+        if self.fuzzy is None:
+            return None
+        return self.fuzzy.best(text)
+
+    def find(self, raw):
+        """
+        在原始文本中查找最靠前的命中：按规范化后的文本扫描，只把最靠前的命中换算回原文。
+        规范化只删除或逐字替换字符，换算不改变命中的先后，每次调用每种规范化最多建一次位置表
+        """
+        hits = []
+        text = self._normalize(self.normalizer, raw)
+        hit = min(self.automaton.iter(text), key=lambda hit: hit[:2], default=None)
+        if hit is not None:
+            start, end, (category, pattern) = hit
+            hits.append(Hit(category, pattern, *self._raw_span(self.normalizer, raw, start, end)))
+        if self.regex_entries:
+            text = self._normalize(self.regex_normalizer, raw)
+            hit = min(self._regex_matches(text), key=lambda hit: hit[1:], default=None)
+            if hit is not None:
+                index, start, end = hit
+                category, pattern = self.regex_entries[index]
+                span = self._raw_span(self.regex_normalizer, raw, start, end)
+                hits.append(Hit(category, pattern, *span))
+        if not hits:
+            return None
+        return min(hits, key=lambda hit: (hit.start, hit.end))
+
+    def fuzzy_find(self, raw):
+        """原始文本中相似度最高的近似命中，位置换算回原文；词条取规范化后的形式"""
+        hit = self.fuzzy_best(self._normalize(self.normalizer, raw))
+        if hit is None:
+            return None
+        start, end = self._raw_span(self.normalizer, raw, hit.start, hit.end)
+        return hit._replace(start=start, end=end)
+
+    def _regex_matches(self, text):
+        """全部正则词条的命中，产出 (词条下标, 起点, 终点)"""
+        if self.regex is not None:
+            for m in self.regex.finditer(text):
+                group = m.lastgroup
+                yield int(group[1:]), m.start(group), m.end(group)
+        for index, compiled in self.separate:
+            # 与合并正则一致：每个起点都尝试一次，重叠命中不会被吞掉
+            m = compiled.search(text)
+            while m is not None:
+                yield index, m.start(), m.end()
+                m = compiled.search(text, m.start() + 1)
+
+    @staticmethod
+    def _normalize(normalizer, text):
+        return normalizer(text) if normalizer is not None else text
+
+    @staticmethod
+    def _raw_span(normalizer, raw, start, end):
+        if normalizer is None:
+            return start, end
+        return normalizer.raw_span(raw, start, end)
+
+
+def load_lexicon(path):
+    """读取词库 json，文件不存在时返回空词库"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 额外的繁简/异体字映射，格式为 {"繁": "简"}，文件不存在时只使用内置映射
+VARIANTS_FILE = os.path.join(base_dir, "static/variants.json")
+
+WHITESPACE = " \n\r\t\f\v 　  "
+ZERO_WIDTH = "​‌‍‎‏⁠﻿­"
+# 插在字与字之间用于规避词库匹配的填充符号
+PUNCTUATION = (
+    "·•・.。,，、;；:：!！?？'\"“”‘’`~～-－—_＿*＊#＃|｜/／\\＼"
+    "()（）[]［］【】{}｛｝<>《》〈〉「」『』+＋=＝^＾&＆%％@＠$＄"
+)
+
+# 常见繁体字到简体字，覆盖公文涉密措辞中的高频字
+TRADITIONAL = dict(
+    zip(
+        "機祕內絕傳國們開會議級關鍵訊資網絡統計劃預審査報導處總體請單據檢測證號書檔發佈範圍閱讀標準權領幹紀調項價購費財務問題應響軍隊戰術設備區線選舉變動擬讓條規則隱瞞談話記錄複製轉載嚴屬於參與負責見實際採經濟產業營運協組織職辦廳長員將對時間為後這個來說從點還沒過當樣現給頭數進認識邊決",
+        "机秘内绝传国们开会议级关键讯资网络统计划预审查报导处总体请单据检测证号书档发布范围阅读标准权领干纪调项价购费财务问题应响军队战术设备区线选举变动拟让条规则隐瞒谈话记录复制转载严属于参与负责见实际采经济产业营运协组织职办厅长员将对时间为后这个来说从点还没过当样现给头数进认识边决",
+    )
+)
+
+# 内容规范化：写回 doc_content，交给模型和缓存键使用，保留标点
+CONTENT_STEPS = os.getenv(
+    "NORMALIZE_STEPS", "whitespace,zero_width,fullwidth,variants"
+).split(",")
+# 匹配规范化：仅用于词库扫描，额外去掉填充符号
+MATCH_STEPS = os.getenv(
+    "MATCH_NORMALIZE_STEPS", "whitespace,zero_width,fullwidth,variants,punctuation"
+).split(",")
+
+
+def load_variants(path=VARIANTS_FILE):
+    variants = dict(TRADITIONAL)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            variants.update(json.load(f))
+    return variants
+
+
+def build_table(steps, variants):
+    """
+    把各步骤合并为一张 str.translate 转换表；每个字符只映射到单个字符或被删除，
+    规范化后的每个字符都唯一对应原文中的一个字符
+    """
+    table = {}
+    for step in (step.strip() for step in steps):
+        if not step:
+            continue
+        if step == "whitespace":
+            table.update({ord(ch): None for ch in WHITESPACE})
+        elif step == "zero_width":
+            table.update({ord(ch): None for ch in ZERO_WIDTH})
+        elif step == "fullwidth":
+            # 全角 ASCII（！到～）转半角
+            table.update({code: chr(code - 0xFEE0) for code in range(0xFF01, 0xFF5F)})
+        elif step == "variants":
+            table.update(
+                {ord(src): dst for src, dst in variants.items() if len(src) == len(dst) == 1}
+            )
+        elif step == "punctuation":
+            table.update({ord(ch): None for ch in PUNCTUATION})
+        else:
+            raise ValueError(f"未知的规范化步骤: {step}")
+    # 后加入的步骤会覆盖先前的映射，再按最终结果解析一次链式映射（如全角符号 -> 半角 -> 删除）
+    for code, value in list(table.items()):
+        if value is not None and ord(value) in table:
+            table[code] = table[ord(value)]
+    return table
+
+
+class Normalizer:
+    """
+    基于预计算转换表的单次遍历规范化，并可按需生成规范化文本到原文的位置映射，
+    词库命中位置据此换算回原始文档
+    """
+
+    def __init__(self, steps, variants=None):
+        self.steps = steps
+        self.table = build_table(steps, variants if variants is not None else load_variants())
+
+    def __call__(self, text):
+        return text.translate(self.table)
+
+    def offset_map(self, text):
+        """规范化文本第 i 个字符在原文中的下标"""
+        table = self.table
+        return [i for i, ch in enumerate(text) if table.get(ord(ch), ch) is not None]
+
+    def raw_span(self, text, start, end, offsets=None):
+        """把规范化文本中的 [start, end) 换算为原文中的区间"""
+        offsets = offsets if offsets is not None else self.offset_map(text)
+        if start >= end or end > len(offsets):
+            return start, end
+        return offsets[start], offsets[end - 1] + 1
+
+
+_variants = load_variants()
+content_normalizer = Normalizer(CONTENT_STEPS, _variants)
+match_normalizer = Normalizer(MATCH_STEPS, _variants)
+
+
+def table_digest(*normalizers):
+    """规范化配置的摘要，配置变化时判定结果缓存随之失效"""
+    items = [sorted(n.table.items(), key=lambda kv: kv[0]) for n in normalizers]
+    return hashlib.sha256(repr(items).encode("utf-8")).hexdigest()[:8]
+
+
+NORMALIZE_VERSION = table_digest(content_normalizer, match_normalizer)
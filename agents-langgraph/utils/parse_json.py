@@ -0,0 +1,187 @@
+import json
+import re
+
+# 模型常输出 Python 风格的字面量
+LITERALS = {"True": True, "False": False, "None": None}
+
+
+def decode_value(text):
+    """解析单个字段的值，无法解析时按原样保留为字符串"""
+    text = text.strip()
+    if text in LITERALS:
+        return LITERALS[text]
+    try:
+        # 允许字符串中出现未转义的换行
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return text
+
+
+# 模型输出的布尔字段可能是字符串
+def to_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ["true", "yes", "1"]
+    return value
+
+
+def to_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class StreamingJSONParser:
+    """
+    增量解析模型流式输出的 JSON 对象：逐段喂入 token，顶层字段的值一结束即可取用，
+    不必等待整段输出完成；容忍 ```json 代码块标记、对象前后的多余文字、
+    字符串外的 // 注释以及 True / False 字面量
+    """
+
+    def __init__(self):
+        self.chars = []  # 去除注释后的对象文本
+        self.fields = {}
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.comment = False
+        self.pending_slash = False
+        # 顶层对象中的位置：key / key_string / colon / value
+        self.expect = "key"
+        self.key = None
+        self.key_start = 0
+        self.value_start = 0
+
+    def feed(self, chunk):
+        """喂入一段输出，返回本段中完成解析的顶层字段"""
+        completed = {}
+        for c in chunk:
+            if self.done:
+                break
+            self._consume(c, completed)
+        return completed
+
+    def _consume(self, c, completed):
+        if not self.started:
+            if c == "{":
+                self.started = True
+                self.depth = 1
+                self.chars.append(c)
+            return
+        if self.comment:
+            if c == "\n":
+                self.comment = False
+                self.chars.append(c)
+            return
+        if self.in_string:
+            self.chars.append(c)
+            if self.escape:
+                self.escape = False
+            elif c == "\\":
+                self.escape = True
+            elif c == '"':
+                self.in_string = False
+                if self.expect == "key_string":
+                    key_text = "".join(self.chars[self.key_start :])
+                    self.key = json.loads(key_text, strict=False)
+                    self.expect = "colon"
+            return
+        if self.pending_slash:
+            self.pending_slash = False
+            if c == "/":
+                self.comment = True
+                return
+            self.chars.append("/")
+        if c == "/":
+            self.pending_slash = True
+            return
+
+        self.chars.append(c)
+        if c == '"':
+            self.in_string = True
+            if self.depth == 1 and self.expect == "key":
+                self.expect = "key_string"
+                self.key_start = len(self.chars) - 1
+        elif c in "{[":
+            self.depth += 1
+        elif c in "}]":
+            self.depth -= 1
+            if self.depth == 0:
+                self._finish_value(completed)
+                self.done = True
+        elif c == ":" and self.depth == 1 and self.expect == "colon":
+            self.expect = "value"
+            self.value_start = len(self.chars)
+        elif c == "," and self.depth == 1 and self.expect == "value":
+            self._finish_value(completed)
+            self.expect = "key"
+
+    def _finish_value(self, completed):
+        if self.expect != "value" or self.key is None:
+            return
+        # 不含结尾的 , 或 }
+        value = decode_value("".join(self.chars[self.value_start : -1]))
+        self.fields[self.key] = value
+        completed[self.key] = value
+        self.key = None
+
+    def partial_string(self, key):
+        """
+        字符串字段 key 的当前内容：已完成时返回完整值，正在生成时返回已生成的部分，
+        尚未开始或不是字符串时返回空串
+        """
+        if key in self.fields:
+            return str(self.fields[key])
+        if self.key != key or self.expect != "value":
+            return ""
+        text = "".join(self.chars[self.value_start :]).lstrip()
+        if not text.startswith('"'):
+            return ""
+        body = text[1:]
+        if not self.in_string:
+            # 字符串已闭合，逗号或右括号还没到
+            body = body.rstrip()[:-1]
+        elif self.escape:
+            # 去掉尚未完整的转义
+            body = body[:-1]
+        body = re.sub(r"\\u[0-9a-fA-F]{0,3}$", "", body)
+        try:
+            return json.loads(f'"{body}"', strict=False)
+        except json.JSONDecodeError:
+            return ""
+
+    def close(self):
+        """
+        输出结束后返回解析出的对象；未解析到完整的顶层对象（输出被截断或没有对象）时
+        抛出 JSONDecodeError。流式过程中已完成的字段仍可通过 fields 取用
+        """
+        if not self.done:
+            text = "".join(self.chars)
+            raise json.JSONDecodeError("未能从模型输出中解析出完整的 JSON 对象", text, len(text))
+        return dict(self.fields)
+
+
+def parse_json(text):
+    """
+    解析模型的完整输出：合法 JSON 直接解析，否则按流式解析器的容错规则提取顶层字段；
+    无法解析或对象不完整时抛出 JSONDecodeError
+    """
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    return parser.close()
+
+
+def require_keys(response_json, keys):
+    """缺少必需字段时抛出 KeyError，调用方按解析失败处理"""
+    missing = [key for key in keys if key not in response_json]
+    if missing:
+        raise KeyError(f"模型输出缺少字段: {', '.join(missing)}")
+    return response_json
@@ -0,0 +1,59 @@
+import pytest
+
+from utils.chunking import chunk_confidence, reduce_chunk_results, split_windows
+
+
+def is_secret(result):
+    return result.get("result") in ("涉密", True)
+
+
+def test_short_text_is_one_window():
+    assert split_windows("短文本", 10, 2) == [(0, "短文本")]
+
+
+def test_windows_overlap_and_cover_text():
+    text = "".join(chr(0x4E00 + i) for i in range(24))
+    windows = split_windows(text, 10, 3)
+    assert [start for start, _ in windows] == [0, 7, 14]
+    for start, window in windows:
+        assert window == text[start : start + 10]
+    # 最后一个窗口到达文本末尾，相邻窗口重叠 3 个字符
+    assert windows[-1][0] + len(windows[-1][1]) == len(text)
+    assert windows[0][1][-3:] == windows[1][1][:3]
+
+
+def test_overlap_must_be_smaller_than_size():
+    with pytest.raises(ValueError):
+        split_windows("文本", 3, 3)
+
+
+def test_chunk_confidence_tolerates_bad_values():
+    assert chunk_confidence({"confidence": "85"}) == 85
+    assert chunk_confidence({"confidence": "高"}) == 0
+    assert chunk_confidence({}) == 0
+
+
+def test_any_risky_chunk_makes_document_risky():
+    results = [
+        (2, {"result": "非涉密", "confidence": 95, "evidence": "c"}),
+        (0, {"result": "涉密", "confidence": 70, "evidence": "a"}),
+        (1, {"result": "涉密", "confidence": 88, "evidence": "b"}),
+    ]
+    reduced = reduce_chunk_results(results, 3, is_secret)
+    assert reduced["result"] == "涉密"
+    assert reduced["confidence"] == 88
+    # 只保留风险分块的证据，按分块顺序拼接
+    assert reduced["evidence"] == "分块1/3：a；分块2/3：b"
+
+
+def test_clean_document_takes_minimum_confidence():
+    results = [
+        (1, {"result": "非涉密", "confidence": 60, "evidence": "b"}),
+        (0, {"result": "非涉密", "confidence": 90, "evidence": "a"}),
+    ]
+    reduced = reduce_chunk_results(results, 4, is_secret)
+    assert reduced == {
+        "result": "非涉密",
+        "confidence": 60,
+        "evidence": "分块1/4：a；分块2/4：b",
+    }
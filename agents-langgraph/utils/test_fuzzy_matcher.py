@@ -0,0 +1,42 @@
+import pytest
+
+from utils.matcher import FuzzyMatcher, approximate_matches
+
+ENTRIES = [("涉密短语", "严禁外传")]
+
+
+@pytest.mark.parametrize("text", ["严禁外出", "严格外传", "严禁外", "禁外传播"])
+def test_near_miss_words_are_rejected(text):
+    assert FuzzyMatcher(ENTRIES).best(text) is None
+
+
+@pytest.mark.parametrize("text", ["本文件严禁w外传", "严x禁外传", "严禁外传"])
+def test_inserted_padding_is_matched(text):
+    hit = FuzzyMatcher(ENTRIES).best(text)
+    assert hit is not None
+    assert hit.pattern == "严禁外传"
+    assert text[hit.start : hit.end].replace("w", "").replace("x", "") == "严禁外传"
+
+
+def test_inserted_padding_reports_distance():
+    hit = FuzzyMatcher(ENTRIES).best("严禁w外传")
+    assert (hit.distance, hit.similarity) == (1, 0.75)
+
+
+def test_substitutions_only_when_enabled():
+    matcher = FuzzyMatcher(ENTRIES, insert_only=False)
+    assert matcher.best("严禁外出") is not None
+
+
+def test_insert_only_allows_no_substitution_or_deletion():
+    assert approximate_matches("abcd", "abxd", 1, insert_only=True) == []
+    assert approximate_matches("abcd", "abd", 1, insert_only=True) == []
+    assert approximate_matches("abcd", "abxcd", 1, insert_only=True) == [(1, 0, 5)]
+
+
+def test_levenshtein_mode_finds_non_overlapping_matches():
+    assert approximate_matches("abcd", "abxd--abcd", 1) == [(1, 0, 4), (0, 6, 10)]
+
+
+def test_short_entries_are_not_indexed():
+    assert FuzzyMatcher([("c", "机密")]).size == 0
@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from utils.lexicon import LexiconRegistry
+
+
+def test_reload_failure_keeps_previous_snapshot(tmp_path, caplog):
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps({"密级标志": ["绝密"]}, ensure_ascii=False), encoding="utf-8")
+    registry = LexiconRegistry({"keywords": str(path)}, interval=0)
+    before = registry.current()
+
+    # 词库路径变成目录时抛出的是 OSError 而不是 ValueError
+    path.unlink()
+    path.mkdir()
+    assert registry.reload(force=True) is before
+    assert "词库重新加载失败" in caplog.text
+    assert registry.current()["keywords"].find("绝密文件").pattern == "绝密"
+
+    path.rmdir()
+    path.write_text(json.dumps({"密级标志": ["机密"]}, ensure_ascii=False), encoding="utf-8")
+    assert registry.reload(force=True) is not before
@@ -0,0 +1,104 @@
+import re
+
+import pytest
+
+from utils.matcher import LexiconMatcher
+
+LEXICON = {
+    "密级标志": ["绝密", "机密", "秘密★[0-9]+年", "内部资料"],
+    "涉密编号": [r"[A-Z]{2}-\d{4}", "(?i)secret", r"(机)密\1"],
+}
+
+TEXTS = [
+    "",
+    "本文件为机密，编号 AB-1234，SECRET 级别",
+    "秘密★10年 内部资料 绝密绝密",
+    "机密机 以及 Secret 和 secret",
+    "公开发布的通知",
+]
+
+
+def naive_hits(lexicon, text):
+    # 逐词条、逐起点用 re 匹配；TEXTS 中不存在两个正则词条命中同一起点的情况
+    hits = set()
+    for category, patterns in lexicon.items():
+        for pattern in patterns:
+            compiled = re.compile(pattern)
+            for pos in range(len(text)):
+                m = compiled.match(text, pos)
+                if m is not None:
+                    hits.add((category, pattern, m.start(), m.end()))
+    return hits
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_scan_matches_re(text):
+    hits = LexiconMatcher(LEXICON).scan(text)
+    assert {tuple(hit) for hit in hits} == naive_hits(LEXICON, text)
+
+
+def test_inline_global_flag_is_scanned_separately():
+    matcher = LexiconMatcher({"涉密编号": ["(?i)secret", "AB-[0-9]+"]})
+    assert matcher.regex is not None
+    assert [entry for entry, _ in matcher.separate] == [0]
+    hit = matcher.find("classified SECRET")
+    assert (hit.pattern, hit.start, hit.end) == ("(?i)secret", 11, 17)
+
+
+def test_backreference_is_scanned_separately():
+    matcher = LexiconMatcher({"密级标志": [r"(机)密\1", "绝密"]})
+    hit = matcher.find("内容：机密机")
+    assert (hit.pattern, hit.start, hit.end) == (r"(机)密\1", 3, 6)
+    assert matcher.find("内容：机密") is None
+
+
+def test_combined_compile_failure_falls_back():
+    # 两个词条各自合法，合并后命名组重复
+    matcher = LexiconMatcher({"涉密编号": ["(?P<x>AB)-1", "(?P<x>CD)-2"]})
+    assert matcher.regex is None
+    assert len(matcher.separate) == 2
+    assert [hit.pattern for hit in matcher.scan("AB-1 CD-2")] == [
+        "(?P<x>AB)-1",
+        "(?P<x>CD)-2",
+    ]
+
+
+def test_literal_hits_overlap():
+    hits = LexiconMatcher({"密级标志": ["绝密", "密级"]}).scan("绝密级")
+    assert [(hit.pattern, hit.start, hit.end) for hit in hits] == [
+        ("绝密", 0, 2),
+        ("密级", 1, 3),
+    ]
+
+
+class CountingNormalizer:
+    """去掉空格的规范化，记录位置换算的次数"""
+
+    def __init__(self):
+        self.mapped = 0
+
+    def __call__(self, text):
+        return text.replace(" ", "")
+
+    def raw_span(self, text, start, end):
+        self.mapped += 1
+        offsets = [i for i, ch in enumerate(text) if ch != " "]
+        return offsets[start], offsets[end - 1] + 1
+
+
+def test_find_maps_only_the_reported_hit():
+    normalizer = CountingNormalizer()
+    matcher = LexiconMatcher(
+        {"密级标志": ["绝密", "机 密"], "涉密编号": [r"AB-\d+"]},
+        normalizer=normalizer,
+        regex_normalizer=normalizer,
+    )
+    hit = matcher.find("AB-1 " + "绝 密 机密 " * 1000)
+    assert (hit.pattern, hit.start, hit.end) == (r"AB-\d+", 0, 4)
+    # 字面量与正则各换算一次，与命中数无关
+    assert normalizer.mapped == 2
+
+    normalizer.mapped = 0
+    hit = matcher.find("内容 机 密，绝密")
+    assert (hit.pattern, hit.start, hit.end) == ("机 密", 3, 6)
+    assert normalizer.mapped == 1
@@ -0,0 +1,77 @@
+import pytest
+
+from utils.matcher import LexiconMatcher
+from utils.normalize import Normalizer, content_normalizer, match_normalizer
+
+VARIANTS = {"機": "机", "內": "内"}
+
+
+def test_content_profile_keeps_punctuation():
+    normalizer = Normalizer(["whitespace", "zero_width", "fullwidth", "variants"], VARIANTS)
+    assert normalizer("機 密​，ＡＢ１\n內部") == "机密,AB1内部"
+
+
+def test_match_profile_drops_padding():
+    normalizer = Normalizer(
+        ["whitespace", "zero_width", "fullwidth", "variants", "punctuation"], VARIANTS
+    )
+    assert normalizer("機·密－文 件") == "机密文件"
+
+
+def test_offset_map_points_back_to_raw_characters():
+    normalizer = Normalizer(["whitespace", "punctuation", "variants"], VARIANTS)
+    raw = "本 文·件 機密"
+    text = normalizer(raw)
+    offsets = normalizer.offset_map(raw)
+    assert len(offsets) == len(text)
+    assert [normalizer(raw[i]) for i in offsets] == list(text)
+    start = text.index("机密")
+    assert raw[slice(*normalizer.raw_span(raw, start, start + 2))] == "機密"
+
+
+def test_unknown_step_is_rejected():
+    with pytest.raises(ValueError):
+        Normalizer(["whitespace", "upper"], {})
+
+
+def make_matcher(lexicon, fuzzy=None):
+    return LexiconMatcher(
+        lexicon, fuzzy, normalizer=match_normalizer, regex_normalizer=content_normalizer
+    )
+
+
+@pytest.mark.parametrize(
+    "entry, raw",
+    [
+        ("《内部参考》", "请勿外传：内部参考第3期"),
+        ("內部資料", "本件为内部资料"),
+        ("A-1方案", "执行Ａ－１方案"),
+    ],
+)
+def test_entries_are_normalized_like_text(entry, raw):
+    hit = make_matcher({"c": [entry]}).find(raw)
+    assert hit is not None and hit.pattern == entry
+
+
+def test_find_reports_raw_positions():
+    raw = "前言。机 · 密 文件"
+    hit = make_matcher({"c": ["机密"]}).find(raw)
+    assert raw[hit.start : hit.end] == "机 · 密"
+
+
+def test_entries_normalizing_to_empty_are_rejected():
+    matcher = make_matcher({"c": ["——", "《》", "机密"]})
+    assert matcher.rejected == [("c", "——"), ("c", "《》")]
+    assert matcher.size == 1
+
+
+def test_regex_entries_scan_text_with_punctuation():
+    matcher = make_matcher({"c": [r"第\d+号.{0,2}密"]})
+    hit = matcher.find("见 第12号：密件")
+    assert hit is not None
+
+
+def test_fuzzy_find_maps_to_raw():
+    raw = "注意：严·禁x外传"
+    hit = make_matcher({"c": ["严禁外传"]}, {"max_errors": 1}).fuzzy_find(raw)
+    assert raw[hit.start : hit.end] == "严·禁x外传"
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from utils.parse_json import StreamingJSONParser, parse_json, require_keys
+
+
+def test_parse_plain_json():
+    assert parse_json('{"result": true, "confidence": 90}') == {
+        "result": True,
+        "confidence": 90,
+    }
+
+
+def test_parse_tolerates_fence_comments_and_python_literals():
+    text = '```json\n{"result": True, // 结论\n "evidence": "a//b"}\n```'
+    assert parse_json(text) == {"result": True, "evidence": "a//b"}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"is_sensitive": true, "evidence": "文本内容为',
+        '{"is_sensitive": true, ',
+        "Sorry, I cannot help with that",
+        "",
+    ],
+)
+def test_parse_rejects_truncated_or_missing_object(text):
+    with pytest.raises(json.JSONDecodeError):
+        parse_json(text)
+
+
+def test_complete_empty_object_fails_required_keys():
+    with pytest.raises(KeyError):
+        require_keys(parse_json("Sorry {}"), ("evidence", "confidence"))
+
+
+def test_streaming_fields_complete_before_object_ends():
+    parser = StreamingJSONParser()
+    completed = {}
+    for token in ['{"res', 'ult": fal', 'se, "result_confidence": 8', "5, ", '"result_detail": "进行']:
+        completed.update(parser.feed(token))
+    assert completed == {"result": False, "result_confidence": 85}
+    assert not parser.done
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
+    parser.feed('中"}')
+    assert parser.close()["result_detail"] == "进行中"
+
+
+def test_streaming_ignores_braces_inside_strings():
+    parser = StreamingJSONParser()
+    parser.feed('{"evidence": "含有 } 与 , 的文本", "nested": {"a": [1, 2]}}')
+    assert parser.close() == {"evidence": "含有 } 与 , 的文本", "nested": {"a": [1, 2]}}
+
+
+def test_partial_string_while_generating():
+    parser = StreamingJSONParser()
+    parser.feed('{"result": true, "result_confidence": 90, "result_detail": "含有\\')
+    assert parser.partial_string("result_detail") == "含有"
+    parser.feed('n密级')
+    assert parser.partial_string("result_detail") == "含有\n密级"
+    parser.feed('标志" ')
+    assert parser.partial_string("result_detail") == "含有\n密级标志"
+    assert parser.partial_string("result") == "True"
+    assert parser.partial_string("evidence") == ""